@@ -0,0 +1,161 @@
+-- Change log behind delta sync (GET /api/beers/changes) and the live feed:
+-- every insert, edit and delete of a beer is logged by a trigger, so clients
+-- can catch up from a cursor instead of downloading the whole feed again
+
+-- One row per changed beer. xid is the writing transaction, so readers can
+-- tell which entries are final (see get_beer_changes)
+CREATE TABLE IF NOT EXISTS beer_changes (
+  xid XID8 NOT NULL DEFAULT pg_current_xact_id(),
+  seq BIGSERIAL NOT NULL,
+  beer_id UUID NOT NULL,
+  changed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (xid, seq)
+);
+
+-- Newest pruned entry; cursors at or before it can't be caught up any more
+CREATE TABLE IF NOT EXISTS beer_changes_pruned (
+  id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+  xid XID8 NOT NULL,
+  seq BIGINT NOT NULL
+);
+
+-- Enable RLS (no policies: only the functions below touch these tables)
+ALTER TABLE beer_changes ENABLE ROW LEVEL SECURITY;
+ALTER TABLE beer_changes_pruned ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION log_beer_change()
+RETURNS TRIGGER AS $$
+BEGIN
+  INSERT INTO beer_changes (beer_id)
+  VALUES (CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END);
+
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+DROP TRIGGER IF EXISTS beers_change_log ON beers;
+CREATE TRIGGER beers_change_log
+  AFTER INSERT OR DELETE OR UPDATE ON beers
+  FOR EACH ROW EXECUTE FUNCTION log_beer_change();
+
+-- Returns {beers, deleted, xid, seq, has_more, expired}
+--   beers:    current rows of beers inserted or edited after the cursor
+--   deleted:  ids of beers deleted after the cursor
+--   xid, seq: the cursor to pass next time
+-- Without since_xid nothing is returned, only a cursor for "now".
+--
+-- Sequence numbers are handed out before commit, so a later entry can become
+-- visible while an earlier one is still in flight. Only entries of
+-- transactions older than every running one (the snapshot xmin) are read,
+-- in (xid, seq) order, so a cursor never moves past a change it hasn't seen.
+-- Beers are reported by their state now, which keeps results right however
+-- many times a beer changed in between.
+CREATE OR REPLACE FUNCTION get_beer_changes(since_xid TEXT DEFAULT NULL, since_seq BIGINT DEFAULT 0, max_rows INTEGER DEFAULT 200)
+RETURNS JSON AS $$
+DECLARE
+  horizon XID8 := pg_snapshot_xmin(pg_current_snapshot());
+  since XID8 := since_xid::XID8;
+  pruned beer_changes_pruned%ROWTYPE;
+  changed UUID[];
+  has_more BOOLEAN;
+  next_xid XID8;
+  next_seq BIGINT;
+BEGIN
+  IF since IS NULL THEN
+    RETURN json_build_object(
+      'beers', '[]'::json, 'deleted', '[]'::json,
+      'xid', horizon::text, 'seq', 0, 'has_more', false, 'expired', false
+    );
+  END IF;
+
+  SELECT * INTO pruned FROM beer_changes_pruned WHERE id = 1;
+  IF FOUND AND (since, since_seq) < (pruned.xid, pruned.seq) THEN
+    RETURN json_build_object(
+      'beers', '[]'::json, 'deleted', '[]'::json,
+      'xid', since_xid, 'seq', since_seq, 'has_more', false, 'expired', true
+    );
+  END IF;
+
+  WITH page AS (
+    SELECT c.xid, c.seq, c.beer_id,
+           row_number() OVER (ORDER BY c.xid, c.seq) AS n
+    FROM (
+      SELECT xid, seq, beer_id
+      FROM beer_changes
+      WHERE (xid, seq) > (since, since_seq)
+        AND xid < horizon
+      ORDER BY xid, seq
+      LIMIT max_rows + 1
+    ) c
+  )
+  SELECT
+    COALESCE(array_agg(DISTINCT beer_id) FILTER (WHERE n <= max_rows), '{}'),
+    COUNT(*) > max_rows,
+    (array_agg(xid ORDER BY n DESC) FILTER (WHERE n <= max_rows))[1],
+    (array_agg(seq ORDER BY n DESC) FILTER (WHERE n <= max_rows))[1]
+  INTO changed, has_more, next_xid, next_seq
+  FROM page;
+
+  -- Caught up: everything before the horizon has been read
+  IF NOT has_more THEN
+    IF (horizon, 0::BIGINT) > (since, since_seq) THEN
+      next_xid := horizon;
+      next_seq := 0;
+    ELSE
+      next_xid := since;
+      next_seq := since_seq;
+    END IF;
+  END IF;
+
+  RETURN json_build_object(
+    'beers', (
+      SELECT COALESCE(json_agg(b ORDER BY b.created_at DESC, b.id DESC), '[]'::json)
+      FROM beers b
+      WHERE b.id = ANY(changed)
+    ),
+    'deleted', (
+      SELECT COALESCE(json_agg(c.id), '[]'::json)
+      FROM unnest(changed) AS c(id)
+      WHERE NOT EXISTS (SELECT 1 FROM beers b WHERE b.id = c.id)
+    ),
+    'xid', next_xid::text,
+    'seq', next_seq,
+    'has_more', has_more,
+    'expired', false
+  );
+END;
+$$ LANGUAGE plpgsql STABLE SECURITY DEFINER SET search_path = public;
+
+GRANT EXECUTE ON FUNCTION get_beer_changes(TEXT, BIGINT, INTEGER) TO anon, authenticated;
+
+-- Drops log entries older than keep; run daily by the maintenance cron
+-- (api/sweep-storage.py). Clients whose cursor is older must refetch the feed.
+CREATE OR REPLACE FUNCTION prune_beer_changes(keep INTERVAL DEFAULT '30 days')
+RETURNS INTEGER AS $$
+DECLARE
+  newest beer_changes%ROWTYPE;
+  removed INTEGER;
+BEGIN
+  SELECT * INTO newest
+  FROM beer_changes
+  WHERE changed_at < NOW() - keep
+  ORDER BY xid DESC, seq DESC
+  LIMIT 1;
+
+  IF NOT FOUND THEN
+    RETURN 0;
+  END IF;
+
+  DELETE FROM beer_changes WHERE (xid, seq) <= (newest.xid, newest.seq);
+  GET DIAGNOSTICS removed = ROW_COUNT;
+
+  INSERT INTO beer_changes_pruned (id, xid, seq)
+  VALUES (1, newest.xid, newest.seq)
+  ON CONFLICT (id) DO UPDATE SET xid = EXCLUDED.xid, seq = EXCLUDED.seq;
+
+  RETURN removed;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+REVOKE EXECUTE ON FUNCTION prune_beer_changes(INTERVAL) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION prune_beer_changes(INTERVAL) TO service_role;
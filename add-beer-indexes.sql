@@ -0,0 +1,16 @@
+-- Indexes for the hot beers queries, all keyset-paginated on (created_at, id)
+-- newest first (see api/pagination.py). Check the plans with
+-- benchmarks/query_plans.py against a local Postgres.
+
+-- my-beers: one user's beers newest first. Also answers the leaderboard
+-- rollup backfill's (user_id, created_at) projection from the index alone.
+CREATE INDEX IF NOT EXISTS beers_user_id_created_at_id_idx
+  ON beers (user_id, created_at DESC, id DESC);
+
+-- all-beers feed newest first, and MAX(created_at) for get_beer_feed_version()
+CREATE INDEX IF NOT EXISTS beers_created_at_id_idx
+  ON beers (created_at DESC, id DESC);
+
+-- The delete ownership check (id, user_id) is served by the primary key
+
+ANALYZE beers;
@@ -0,0 +1,72 @@
+-- Cheap validator for conditional GETs on the feed and leaderboard: a
+-- trigger-maintained row count and deletion generation plus MAX(created_at)
+--
+-- Trade-off: every insert, edit and delete of a beer updates the one
+-- beer_feed_state row, so concurrent writes queue on its row lock until each
+-- transaction ends. Beer writes are single-statement transactions here, so the
+-- wait is short. A sequence would avoid the lock, but nextval() is visible
+-- before commit: the version could move ahead of the data and the old body
+-- would be cached under the new ETag.
+
+CREATE TABLE IF NOT EXISTS beer_feed_state (
+  id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+  row_count BIGINT NOT NULL DEFAULT 0,
+  deletion_generation BIGINT NOT NULL DEFAULT 0
+);
+
+-- Enable RLS (no policies: only the functions below touch this table)
+ALTER TABLE beer_feed_state ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION maintain_beer_feed_state()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    UPDATE beer_feed_state SET row_count = row_count + 1 WHERE id = 1;
+  ELSIF TG_OP = 'DELETE' THEN
+    UPDATE beer_feed_state
+    SET row_count = row_count - 1,
+        deletion_generation = deletion_generation + 1
+    WHERE id = 1;
+  ELSE
+    -- Edits don't change the count but must still invalidate cached copies
+    UPDATE beer_feed_state SET deletion_generation = deletion_generation + 1 WHERE id = 1;
+  END IF;
+
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- MAX(created_at) reads the first entry of this index instead of scanning beers
+-- (add-beer-indexes.sql creates the same index, whichever runs first wins)
+CREATE INDEX IF NOT EXISTS beers_created_at_id_idx
+  ON beers (created_at DESC, id DESC);
+
+-- Returns {row_count, deletion_generation, max_created_at} without scanning beers
+CREATE OR REPLACE FUNCTION get_beer_feed_version()
+RETURNS JSON AS $$
+  SELECT json_build_object(
+    'row_count', s.row_count,
+    'deletion_generation', s.deletion_generation,
+    'max_created_at', (SELECT MAX(created_at) FROM beers)
+  )
+  FROM beer_feed_state s
+  WHERE s.id = 1;
+$$ LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public;
+
+GRANT EXECUTE ON FUNCTION get_beer_feed_version() TO anon, authenticated;
+
+-- Install the trigger and seed the count atomically
+BEGIN;
+
+LOCK TABLE beers IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS beers_feed_state ON beers;
+CREATE TRIGGER beers_feed_state
+  AFTER INSERT OR DELETE OR UPDATE ON beers
+  FOR EACH ROW EXECUTE FUNCTION maintain_beer_feed_state();
+
+INSERT INTO beer_feed_state (id, row_count, deletion_generation)
+VALUES (1, (SELECT COUNT(*) FROM beers), 0)
+ON CONFLICT (id) DO UPDATE SET row_count = EXCLUDED.row_count;
+
+COMMIT;
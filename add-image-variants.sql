@@ -0,0 +1,3 @@
+-- Resized, metadata-free copies of each beer photo, written by the upload pipeline:
+-- {"thumb": {"webp": url, "jpg": url}, "feed": {...}, "full": {...}}
+ALTER TABLE beers ADD COLUMN IF NOT EXISTS image_variants JSONB;
@@ -0,0 +1,88 @@
+-- Daily per-user beer counts for the leaderboard, kept current by triggers on
+-- beers so the leaderboard reads users x active days instead of every beer
+
+CREATE TABLE IF NOT EXISTS beer_daily_counts (
+  user_id UUID NOT NULL,
+  day DATE NOT NULL,
+  count INTEGER NOT NULL CHECK (count > 0),
+  PRIMARY KEY (user_id, day)
+);
+
+-- Enable RLS
+ALTER TABLE beer_daily_counts ENABLE ROW LEVEL SECURITY;
+
+-- The leaderboard is public, only the triggers below write to this table
+CREATE POLICY "Anyone can view daily counts" ON beer_daily_counts
+  FOR SELECT TO anon, authenticated USING (true);
+
+-- Days are bucketed in UTC, matching the timestamps the API returns
+CREATE OR REPLACE FUNCTION add_beer_daily_count(p_user_id UUID, p_created_at TIMESTAMPTZ, p_delta INTEGER)
+RETURNS VOID AS $$
+BEGIN
+  IF p_created_at IS NULL THEN
+    RETURN;
+  END IF;
+
+  IF p_delta > 0 THEN
+    INSERT INTO beer_daily_counts (user_id, day, count)
+    VALUES (p_user_id, (p_created_at AT TIME ZONE 'UTC')::date, p_delta)
+    ON CONFLICT (user_id, day)
+    DO UPDATE SET count = beer_daily_counts.count + EXCLUDED.count;
+  ELSE
+    UPDATE beer_daily_counts
+    SET count = count + p_delta
+    WHERE user_id = p_user_id
+      AND day = (p_created_at AT TIME ZONE 'UTC')::date
+      AND count + p_delta > 0;
+
+    IF NOT FOUND THEN
+      DELETE FROM beer_daily_counts
+      WHERE user_id = p_user_id
+        AND day = (p_created_at AT TIME ZONE 'UTC')::date;
+    END IF;
+  END IF;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Only the trigger may adjust counts, keep it out of the public RPC surface
+REVOKE EXECUTE ON FUNCTION add_beer_daily_count(UUID, TIMESTAMPTZ, INTEGER) FROM PUBLIC, anon, authenticated;
+
+CREATE OR REPLACE FUNCTION maintain_beer_daily_counts()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP IN ('DELETE', 'UPDATE') THEN
+    PERFORM add_beer_daily_count(OLD.user_id, OLD.created_at, -1);
+  END IF;
+
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    PERFORM add_beer_daily_count(NEW.user_id, NEW.created_at, 1);
+  END IF;
+
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+-- Install the triggers and backfill atomically so no beer is counted twice or missed
+BEGIN;
+
+LOCK TABLE beers IN SHARE ROW EXCLUSIVE MODE;
+
+DROP TRIGGER IF EXISTS beers_daily_counts_insert_delete ON beers;
+CREATE TRIGGER beers_daily_counts_insert_delete
+  AFTER INSERT OR DELETE ON beers
+  FOR EACH ROW EXECUTE FUNCTION maintain_beer_daily_counts();
+
+DROP TRIGGER IF EXISTS beers_daily_counts_update ON beers;
+CREATE TRIGGER beers_daily_counts_update
+  AFTER UPDATE OF user_id, created_at ON beers
+  FOR EACH ROW EXECUTE FUNCTION maintain_beer_daily_counts();
+
+TRUNCATE beer_daily_counts;
+
+INSERT INTO beer_daily_counts (user_id, day, count)
+SELECT user_id, (created_at AT TIME ZONE 'UTC')::date, COUNT(*)
+FROM beers
+WHERE created_at IS NOT NULL
+GROUP BY user_id, (created_at AT TIME ZONE 'UTC')::date;
+
+COMMIT;
@@ -0,0 +1,47 @@
+-- The whole leaderboard in one round trip: per-user daily counts from the
+-- beer_daily_counts rollup (add-leaderboard-rollup.sql), running totals via a
+-- window function and author names, shaped into the JSON the API returns
+
+-- Returns [{user_name, monthly_data: [{month: 'YYYY-MM-DD', total_drinks}]}]
+-- ordered by final total. Authors sharing a display name are merged into one entry.
+CREATE OR REPLACE FUNCTION get_leaderboard()
+RETURNS JSON AS $$
+  WITH daily AS (
+    SELECT
+      COALESCE(u.raw_user_meta_data->>'name', 'User ' || LEFT(c.user_id::text, 8) || '...') AS user_name,
+      c.day,
+      SUM(c.count) AS drinks
+    FROM beer_daily_counts c
+    LEFT JOIN auth.users u ON u.id = c.user_id
+    GROUP BY 1, 2
+  ),
+  running AS (
+    SELECT
+      user_name,
+      day,
+      SUM(drinks) OVER (PARTITION BY user_name ORDER BY day) AS total_drinks
+    FROM daily
+  ),
+  per_user AS (
+    SELECT
+      user_name,
+      json_agg(
+        json_build_object('month', TO_CHAR(day, 'YYYY-MM-DD'), 'total_drinks', total_drinks)
+        ORDER BY day
+      ) AS monthly_data,
+      MAX(total_drinks) AS final_total,
+      MIN(day) AS first_day
+    FROM running
+    GROUP BY user_name
+  )
+  SELECT COALESCE(
+    json_agg(
+      json_build_object('user_name', user_name, 'monthly_data', monthly_data)
+      ORDER BY final_total DESC, first_day, user_name
+    ),
+    '[]'::json
+  )
+  FROM per_user;
+$$ LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public, auth;
+
+GRANT EXECUTE ON FUNCTION get_leaderboard() TO anon, authenticated;
@@ -0,0 +1,34 @@
+-- Photos in the beer-images bucket that no beer points at any more (deleted
+-- beers, abandoned uploads), for the storage sweeper (api/sweep-storage.py,
+-- backend/storage_cleanup.py) to remove in batches
+
+-- Returns a JSON array of bucket paths, oldest object first
+
+-- min_age keeps the sweeper away from uploads whose beer isn't inserted yet
+CREATE OR REPLACE FUNCTION get_orphaned_beer_images(min_age INTERVAL DEFAULT '1 day', max_rows INTEGER DEFAULT 100)
+RETURNS JSON AS $$
+  WITH referenced AS (
+    SELECT substring(url FROM '/object/public/beer-images/([^?]+)') AS name
+    FROM beers b
+    CROSS JOIN LATERAL (
+      SELECT b.image_url
+      UNION ALL
+      SELECT jsonb_path_query(b.image_variants, '$.*.*') #>> '{}'
+    ) urls(url)
+  ),
+  orphans AS (
+    SELECT o.name, o.created_at
+    FROM storage.objects o
+    WHERE o.bucket_id = 'beer-images'
+      AND o.created_at < NOW() - min_age
+      AND NOT EXISTS (SELECT 1 FROM referenced r WHERE r.name = o.name)
+    ORDER BY o.created_at
+    LIMIT max_rows
+  )
+  SELECT COALESCE(json_agg(name ORDER BY created_at), '[]'::json)
+  FROM orphans;
+$$ LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public, storage;
+
+-- Object names are not public: only the sweeper, using the service role key, may list them
+REVOKE EXECUTE ON FUNCTION get_orphaned_beer_images(INTERVAL, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION get_orphaned_beer_images(INTERVAL, INTEGER) TO service_role;
@@ -0,0 +1,16 @@
+-- Batched user name lookup so the feed and leaderboard resolve every
+-- author in one round trip instead of one get_user_name call per row
+
+-- Returns a JSON object of user id -> name for the ids that have a name
+CREATE OR REPLACE FUNCTION get_user_names(user_ids UUID[])
+RETURNS JSON AS $$
+  SELECT COALESCE(
+    json_object_agg(u.id, u.raw_user_meta_data->>'name'),
+    '{}'::json
+  )
+  FROM auth.users u
+  WHERE u.id = ANY(user_ids)
+    AND u.raw_user_meta_data->>'name' IS NOT NULL;
+$$ LANGUAGE sql STABLE SECURITY DEFINER SET search_path = public, auth;
+
+GRANT EXECUTE ON FUNCTION get_user_names(UUID[]) TO anon, authenticated;
@@ -1,9 +1,22 @@
 from http.server import BaseHTTPRequestHandler
 import json
 import os
-from supabase import create_client, Client
+import sys
+import itertools
+import urllib.parse
+from supabase import Client
 
-class handler(BaseHTTPRequestHandler):
+# Shared helpers live next to the handlers
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from supabase_pool import get_client
+from conditional import feed_etag, etag_matches, REVALIDATE_CACHE_CONTROL
+from user_names import add_user_names
+from response_cache import response_cache
+from pagination import fetch_page, parse_limit
+from streaming import iter_pages, json_array_chunks, start_chunked_response, write_chunks
+from timing import ServerTimingMixin, span
+
+class handler(ServerTimingMixin, BaseHTTPRequestHandler):
     def do_GET(self):
         try:
             # Get Supabase credentials from environment
@@ -21,39 +34,49 @@ class handler(BaseHTTPRequestHandler):
                 self.wfile.write(json.dumps(error_result).encode())
                 return
             
-            # Initialize Supabase client
-            supabase: Client = create_client(supabase_url, supabase_key)
+            # Reuse the process-wide client (keeps its connection alive)
+            supabase: Client = get_client()
+            
+            # Passing limit and/or cursor switches to keyset pagination
+            query_params = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+            paginated = 'limit' in query_params or 'cursor' in query_params
+            
+            # Cheap version check first: unchanged data needs neither the query nor a body.
+            # Pages come from the response cache, which keeps their ETag with them.
+            etag = None if paginated else feed_etag(supabase, self.path)
+            if etag_matches(self.headers.get('If-None-Match'), etag):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', REVALIDATE_CACHE_CONTROL)
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.end_headers()
+                return
             
             try:
                 # Get all beers - we'll get user names separately since we can't join auth.users
-                response = supabase.table("beers").select(
-                    "id, image_url, note, created_at, user_id"
-                ).order("created_at", desc=True).execute()
+                def beers_query():
+                    return supabase.table("beers").select(
+                        "id, image_url, image_variants, note, created_at, user_id"
+                    )
                 
-                # Get user names using RPC function
-                beers = []
-                for beer in response.data:
-                    user_name = "Unknown User"
+                if paginated:
+                    limit = parse_limit(query_params.get('limit', [None])[0])
+                    cursor = query_params.get('cursor', [None])[0]
                     
-                    try:
-                        # Use RPC function to get user name from auth metadata
-                        user_info = supabase.rpc('get_user_name', {'user_id': beer["user_id"]}).execute()
-                        if user_info.data:
-                            user_name = user_info.data
-                    except Exception as rpc_error:
-                        print(f"RPC error for user {beer['user_id']}: {rpc_error}")
-                        # Keep default "Unknown User"
+                    def build_page():
+                        rows, next_cursor = fetch_page(beers_query(), limit, cursor)
+                        result = {"beers": add_user_names(supabase, rows), "next_cursor": next_cursor}
+                        return json.dumps(result).encode()
                     
-                    beers.append({
-                        "id": beer["id"],
-                        "image_url": beer["image_url"],
-                        "note": beer["note"],
-                        "created_at": beer["created_at"],
-                        "user_id": beer["user_id"],
-                        "user_name": user_name
-                    })
-                
-                result = beers
+                    # Every anonymous caller gets the same page, so most are served from memory
+                    scope = f"all-beers?limit={limit}&cursor={cursor or ''}"
+                    etag, body = response_cache.get(scope, lambda: feed_etag(supabase, scope), build_page)
+                else:
+                    # The full list is streamed page by page; fetch the first page
+                    # up front so query errors still get a proper error response
+                    pages = iter_pages(beers_query, key='all-beers')
+                    first_page = next(pages)
+                    body = None
                 
             except Exception as e:
                 print(f"Database query error: {e}")
@@ -67,14 +90,45 @@ class handler(BaseHTTPRequestHandler):
                 self.wfile.write(json.dumps(error_result).encode())
                 return
             
+            if body is None:
+                # Stream the full list, serializing each page as it arrives
+                chunked = start_chunked_response(self, 200)
+                if etag:
+                    self.send_header('ETag', etag)
+                    self.send_header('Cache-Control', REVALIDATE_CACHE_CONTROL)
+                self.send_header('Content-type', 'application/json')
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+                self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+                self.end_headers()
+                chunks = json_array_chunks(
+                    itertools.chain([first_page], pages),
+                    lambda rows: add_user_names(supabase, rows)
+                )
+                with span('stream'):
+                    write_chunks(self, chunks, chunked)
+                return
+            
+            # The client's copy of the page is still current: no body needed
+            if etag_matches(self.headers.get('If-None-Match'), etag):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', REVALIDATE_CACHE_CONTROL)
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.end_headers()
+                return
+            
             # Send successful response
             self.send_response(200)
+            if etag:
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', REVALIDATE_CACHE_CONTROL)
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
             self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
             self.end_headers()
-            self.wfile.write(json.dumps(result).encode())
+            self.wfile.write(body)
             
         except Exception as e:
             error_result = {"error": f"Internal server error: {str(e)}"}
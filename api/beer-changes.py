@@ -0,0 +1,101 @@
+from http.server import BaseHTTPRequestHandler
+import json
+import os
+import sys
+import urllib.parse
+from supabase import Client
+
+# Shared helpers live next to the handlers
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from supabase_pool import get_client
+from user_names import add_user_names
+from pagination import fetch_changes
+from timing import ServerTimingMixin
+
+class handler(ServerTimingMixin, BaseHTTPRequestHandler):
+    """Delta sync for clients that can't hold a stream open: GET /api/beer-changes?since=<cursor>"""
+
+    def do_GET(self):
+        try:
+            # Get Supabase credentials from environment
+            supabase_url = os.environ.get('SUPABASE_URL')
+            supabase_key = os.environ.get('SUPABASE_ANON_KEY')
+            
+            if not supabase_url or not supabase_key:
+                error_result = {"error": "Supabase configuration missing"}
+                self.send_response(500)
+                self.send_header('Content-type', 'application/json')
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+                self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+                self.end_headers()
+                self.wfile.write(json.dumps(error_result).encode())
+                return
+            
+            # Reuse the process-wide client (keeps its connection alive)
+            supabase: Client = get_client()
+            
+            query_params = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+            since = query_params.get('since', [None])[0]
+            
+            try:
+                changes = fetch_changes(supabase, since)
+            
+            except Exception as e:
+                print(f"Database query error: {e}")
+                error_result = {"error": f"Failed to fetch changes: {str(e)}"}
+                self.send_response(400)
+                self.send_header('Content-type', 'application/json')
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+                self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+                self.end_headers()
+                self.wfile.write(json.dumps(error_result).encode())
+                return
+            
+            if changes["expired"]:
+                # The change log was pruned past this cursor
+                error_result = {"error": "Cursor expired, fetch the feed again"}
+                self.send_response(410)
+                self.send_header('Content-type', 'application/json')
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+                self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+                self.end_headers()
+                self.wfile.write(json.dumps(error_result).encode())
+                return
+            
+            result = {
+                "beers": add_user_names(supabase, changes["beers"]),
+                "deleted": changes["deleted"],
+                "next_cursor": changes["next_cursor"],
+                "has_more": changes["has_more"]
+            }
+            
+            # Send successful response
+            body = json.dumps(result).encode()
+            self.send_response(200)
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+            self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+            self.end_headers()
+            self.wfile.write(body)
+            
+        except Exception as e:
+            error_result = {"error": f"Internal server error: {str(e)}"}
+            self.send_response(500)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+            self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+            self.end_headers()
+            self.wfile.write(json.dumps(error_result).encode())
+    
+    def do_OPTIONS(self):
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+        self.end_headers()
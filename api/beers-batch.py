@@ -0,0 +1,117 @@
+from http.server import BaseHTTPRequestHandler
+import json
+import os
+import sys
+
+# Shared helpers live next to the handlers
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from auth_utils import validate_token
+from beer_batch import validate_batch, skipped_ids, finish_results, MAX_BATCH_SIZE
+from response_cache import response_cache
+from timing import ServerTimingMixin, span
+
+class handler(ServerTimingMixin, BaseHTTPRequestHandler):
+    def do_POST(self):
+        try:
+            # Validate authentication
+            authorization = self.headers.get('Authorization')
+            user_id, supabase = validate_token(authorization)
+            
+            # Parse request body: {"beers": [{"id", "note", "image_url", "created_at"}, ...]}
+            content_length = int(self.headers.get('Content-Length', 0))
+            if content_length == 0:
+                self.send_error(400, "Empty request body")
+                return
+            
+            data = json.loads(self.rfile.read(content_length).decode('utf-8'))
+            items = data.get('beers') if isinstance(data, dict) else None
+            
+            if not isinstance(items, list) or not items or len(items) > MAX_BATCH_SIZE:
+                error_result = {"error": f"beers must be a list of 1 to {MAX_BATCH_SIZE} beers"}
+                self.send_response(400)
+                self.send_header('Content-type', 'application/json')
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+                self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+                self.end_headers()
+                self.wfile.write(json.dumps(error_result).encode())
+                return
+            
+            # Invalid beers are reported on their own, the rest still go in
+            rows, results = validate_batch(items, user_id)
+            
+            try:
+                # One multi-row insert; ids that already exist (a retried sync) are skipped
+                inserted = []
+                owned = []
+                if rows:
+                    with span('insert'):
+                        inserted = supabase.table("beers").upsert(
+                            rows, ignore_duplicates=True
+                        ).execute().data
+                    
+                    # A skipped id is only a retry if the existing beer is this user's
+                    skipped = skipped_ids(rows, {beer["id"] for beer in inserted})
+                    if skipped:
+                        with span('select'):
+                            owned = supabase.table("beers").select("id").in_(
+                                "id", skipped
+                            ).eq("user_id", user_id).execute().data
+            
+            except Exception as e:
+                print(f"Database insert error: {e}")
+                error_result = {"error": f"Failed to save beers: {str(e)}"}
+                self.send_response(400)
+                self.send_header('Content-type', 'application/json')
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+                self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+                self.end_headers()
+                self.wfile.write(json.dumps(error_result).encode())
+                return
+            
+            # Cached feed pages and leaderboard no longer match the data
+            if inserted:
+                response_cache.clear()
+            
+            inserted_ids = {beer["id"] for beer in inserted}
+            result = {
+                "created": len(inserted_ids),
+                "results": finish_results(results, inserted_ids, {beer["id"] for beer in owned})
+            }
+            
+            # Send successful response
+            body = json.dumps(result).encode()
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+            self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+            self.end_headers()
+            self.wfile.write(body)
+        
+        except Exception as e:
+            if "Token validation failed" in str(e) or "Invalid token" in str(e):
+                status = 401
+                error_result = {"error": str(e)}
+            elif isinstance(e, ValueError):
+                # Body that isn't JSON
+                status = 400
+                error_result = {"error": f"Invalid request body: {str(e)}"}
+            else:
+                status = 500
+                error_result = {"error": f"Internal server error: {str(e)}"}
+            self.send_response(status)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+            self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+            self.end_headers()
+            self.wfile.write(json.dumps(error_result).encode())
+    
+    def do_OPTIONS(self):
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+        self.end_headers()
@@ -0,0 +1,47 @@
+import json
+import hashlib
+from timing import span
+from single_flight import flights
+
+# Clients may keep a copy but must revalidate it (If-None-Match) before each use
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+
+def feed_etag(supabase, scope):
+    """
+    Build a weak ETag for feed-derived responses from the cheap beers version
+    scope distinguishes endpoints and query strings sharing the same data.
+    Returns: the ETag, or None when the version RPC isn't available
+    """
+    try:
+        # Requests arriving together share one version lookup
+        with span('feed-version'):
+            version = flights.do(
+                'get_beer_feed_version', lambda: supabase.rpc('get_beer_feed_version', {}).execute().data
+            )
+    except Exception as rpc_error:
+        print(f"Feed version unavailable, skipping ETag: {rpc_error}")
+        return None
+
+    if not version:
+        return None
+
+    digest = hashlib.sha1(json.dumps([scope, version], sort_keys=True).encode('utf-8')).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against the current ETag"""
+    if not if_none_match or not etag:
+        return False
+
+    current = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == current:
+            return True
+    return False
@@ -2,54 +2,16 @@ from http.server import BaseHTTPRequestHandler
 import json
 import urllib.parse
 import os
-import base64
-from supabase import create_client, Client
+import sys
 
-def validate_token(authorization_header):
-    """Validate JWT token and return user_id, supabase_client"""
-    if not authorization_header or not authorization_header.startswith('Bearer '):
-        raise Exception("Missing or invalid authorization header")
-    
-    token = authorization_header[7:]  # Remove 'Bearer ' prefix
-    
-    # Get Supabase credentials
-    supabase_url = os.environ.get('SUPABASE_URL')
-    supabase_key = os.environ.get('SUPABASE_ANON_KEY')
-    
-    if not supabase_url or not supabase_key:
-        raise Exception("Supabase configuration missing")
-    
-    try:
-        # Decode JWT token to get user ID
-        parts = token.split('.')
-        if len(parts) != 3:
-            raise Exception("Invalid JWT format")
-        
-        # Decode payload
-        payload_encoded = parts[1]
-        padding = 4 - len(payload_encoded) % 4
-        if padding != 4:
-            payload_encoded += '=' * padding
-            
-        payload_bytes = base64.urlsafe_b64decode(payload_encoded)
-        payload = json.loads(payload_bytes.decode('utf-8'))
-        
-        user_id = payload.get('sub')
-        if not user_id:
-            raise Exception("No user ID in token")
-        
-        # Create authenticated Supabase client
-        supabase: Client = create_client(supabase_url, supabase_key)
-        supabase.postgrest.session.headers.update({
-            "Authorization": f"Bearer {token}"
-        })
-        
-        return user_id, supabase
-        
-    except Exception as e:
-        raise Exception(f"Token validation failed: {str(e)}")
+# Shared helpers live next to the handlers
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from auth_utils import validate_token
+from storage_cleanup import beer_object_paths, schedule_removal
+from response_cache import response_cache
+from timing import ServerTimingMixin, span
 
-class handler(BaseHTTPRequestHandler):
+class handler(ServerTimingMixin, BaseHTTPRequestHandler):
     def do_DELETE(self):
         try:
             # Validate authentication
@@ -74,12 +36,14 @@ class handler(BaseHTTPRequestHandler):
             beer_id = query_params['beer_id'][0]
             
             try:
-                # First verify the beer belongs to the user
-                beer_check = supabase.table("beers").select("id, user_id").eq(
-                    "id", beer_id
-                ).eq("user_id", user_id).execute()
+                # Ownership check and delete in one statement; the deleted row
+                # comes back (DELETE ... RETURNING) with its photo URLs
+                with span('delete'):
+                    deleted = supabase.table("beers").delete().eq(
+                        "id", beer_id
+                    ).eq("user_id", user_id).execute().data
                 
-                if not beer_check.data:
+                if not deleted:
                     error_result = {"error": "Beer not found or not owned by user"}
                     self.send_response(404)
                     self.send_header('Content-type', 'application/json')
@@ -90,10 +54,12 @@ class handler(BaseHTTPRequestHandler):
                     self.wfile.write(json.dumps(error_result).encode())
                     return
                 
-                # Delete the beer
-                delete_response = supabase.table("beers").delete().eq(
-                    "id", beer_id
-                ).execute()
+                # Cached feed pages and leaderboard no longer match the data
+                response_cache.clear()
+                
+                # The photos are removed off the request path, as the user so
+                # storage only lets them touch their own folder
+                schedule_removal(authorization[7:], beer_object_paths(deleted[0], user_id))
                 
                 result = {"message": "Beer deleted successfully"}
                 
@@ -110,13 +76,14 @@ class handler(BaseHTTPRequestHandler):
                 return
             
             # Send successful response
+            body = json.dumps(result).encode()
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.send_header('Access-Control-Allow-Methods', 'DELETE, OPTIONS')
             self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
             self.end_headers()
-            self.wfile.write(json.dumps(result).encode())
+            self.wfile.write(body)
             
         except Exception as e:
             if "Token validation failed" in str(e) or "Invalid token" in str(e):
@@ -0,0 +1,134 @@
+from http.server import BaseHTTPRequestHandler
+import json
+import os
+import sys
+import uuid
+
+# Shared helpers live next to the handlers
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from auth_utils import validate_token
+from storage_cleanup import beer_object_paths, schedule_removal
+from response_cache import response_cache
+from timing import ServerTimingMixin, span
+
+# Beers one request may delete (one PostgREST call with an id IN (...) filter)
+MAX_BULK_DELETE = 100
+
+def parse_beer_id(value):
+    """Canonical (lowercase) beer id, or None when value isn't a UUID"""
+    try:
+        return str(uuid.UUID(value)) if isinstance(value, str) else None
+    except ValueError:
+        return None
+
+class handler(ServerTimingMixin, BaseHTTPRequestHandler):
+    def do_POST(self):
+        try:
+            # Validate authentication
+            authorization = self.headers.get('Authorization')
+            user_id, supabase = validate_token(authorization)
+            
+            # Parse request body: {"beer_ids": [...]}
+            content_length = int(self.headers.get('Content-Length', 0))
+            if content_length == 0:
+                self.send_error(400, "Empty request body")
+                return
+            
+            data = json.loads(self.rfile.read(content_length).decode('utf-8'))
+            beer_ids = data.get('beer_ids') if isinstance(data, dict) else None
+            
+            if not isinstance(beer_ids, list) or not beer_ids or len(beer_ids) > MAX_BULK_DELETE:
+                error_result = {"error": f"beer_ids must be a list of 1 to {MAX_BULK_DELETE} beer ids"}
+                self.send_response(400)
+                self.send_header('Content-type', 'application/json')
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+                self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+                self.end_headers()
+                self.wfile.write(json.dumps(error_result).encode())
+                return
+            
+            # One malformed id would fail the whole IN (...) filter, so those are
+            # answered here and left out of the statement
+            parsed_ids = [parse_beer_id(beer_id) for beer_id in beer_ids]
+            valid_ids = list(dict.fromkeys(beer_id for beer_id in parsed_ids if beer_id))
+            
+            try:
+                # Ownership check and delete for every id in one statement
+                deleted = []
+                if valid_ids:
+                    with span('delete'):
+                        deleted = supabase.table("beers").delete().in_(
+                            "id", valid_ids
+                        ).eq("user_id", user_id).execute().data
+            
+            except Exception as e:
+                print(f"Database delete error: {e}")
+                error_result = {"error": f"Failed to delete beers: {str(e)}"}
+                self.send_response(400)
+                self.send_header('Content-type', 'application/json')
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+                self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+                self.end_headers()
+                self.wfile.write(json.dumps(error_result).encode())
+                return
+            
+            # Cached feed pages and leaderboard no longer match the data
+            if deleted:
+                response_cache.clear()
+            
+            # Every deleted beer's photos go to storage together, in batched removals
+            object_paths = []
+            for beer in deleted:
+                object_paths.extend(beer_object_paths(beer, user_id))
+            schedule_removal(authorization[7:], object_paths)
+            
+            deleted_ids = {beer["id"] for beer in deleted}
+            result = {
+                "deleted": len(deleted_ids),
+                "results": [
+                    {
+                        "beer_id": beer_id,
+                        "status": "invalid_id" if parsed is None
+                        else "deleted" if parsed in deleted_ids else "not_found"
+                    }
+                    for beer_id, parsed in zip(beer_ids, parsed_ids)
+                ]
+            }
+            
+            # Send successful response
+            body = json.dumps(result).encode()
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+            self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+            self.end_headers()
+            self.wfile.write(body)
+        
+        except Exception as e:
+            if "Token validation failed" in str(e) or "Invalid token" in str(e):
+                status = 401
+                error_result = {"error": str(e)}
+            elif isinstance(e, ValueError):
+                # Body that isn't JSON
+                status = 400
+                error_result = {"error": f"Invalid request body: {str(e)}"}
+            else:
+                status = 500
+                error_result = {"error": f"Internal server error: {str(e)}"}
+            self.send_response(status)
+            self.send_header('Content-type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+            self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+            self.end_headers()
+            self.wfile.write(json.dumps(error_result).encode())
+    
+    def do_OPTIONS(self):
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+        self.end_headers()
@@ -0,0 +1,114 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import jwt
+
+# Supabase signs user access tokens for this audience
+JWT_AUDIENCE = 'authenticated'
+JWKS_CACHE_SECONDS = 600
+VERIFIED_CACHE_MAX_ENTRIES = 1024
+
+
+class VerifiedTokenCache:
+    """LRU of token hash -> claims, each entry dropped once the token expires"""
+
+    def __init__(self, max_entries=VERIFIED_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token_hash):
+        with self._lock:
+            entry = self._entries.get(token_hash)
+            if entry is None:
+                return None
+            claims, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[token_hash]
+                return None
+            self._entries.move_to_end(token_hash)
+            return claims
+
+    def put(self, token_hash, claims, expires_at):
+        with self._lock:
+            self._entries[token_hash] = (claims, expires_at)
+            self._entries.move_to_end(token_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+verified_tokens = VerifiedTokenCache()
+_jwks_client = None
+_jwks_lock = threading.Lock()
+
+
+def _get_jwks_client():
+    """PyJWKClient caches the key set and refetches it when a kid is unknown"""
+    global _jwks_client
+    if _jwks_client is None:
+        with _jwks_lock:
+            if _jwks_client is None:
+                supabase_url = os.environ.get('SUPABASE_URL')
+                supabase_key = os.environ.get('SUPABASE_ANON_KEY')
+                if not supabase_url:
+                    raise Exception("Supabase configuration missing")
+                _jwks_client = jwt.PyJWKClient(
+                    f"{supabase_url}/auth/v1/.well-known/jwks.json",
+                    cache_jwk_set=True,
+                    lifespan=JWKS_CACHE_SECONDS,
+                    headers={"apikey": supabase_key} if supabase_key else None
+                )
+    return _jwks_client
+
+
+def _get_signing_key(header):
+    algorithm = header.get('alg')
+
+    if algorithm == 'HS256':
+        # Legacy projects sign with the shared project JWT secret
+        secret = os.environ.get('SUPABASE_JWT_SECRET')
+        if not secret:
+            raise Exception("SUPABASE_JWT_SECRET is not configured")
+        return secret
+
+    if algorithm in ('RS256', 'ES256'):
+        kid = header.get('kid')
+        if not kid:
+            raise Exception("Invalid token: missing key id")
+        return _get_jwks_client().get_signing_key(kid).key
+
+    raise Exception(f"Invalid token: unsupported algorithm {algorithm}")
+
+
+def verify_jwt(token):
+    """
+    Verify a Supabase access token's signature and expiry locally
+    Returns: the token claims or raises Exception
+    """
+    token_hash = hashlib.sha256(token.encode('utf-8')).hexdigest()
+    claims = verified_tokens.get(token_hash)
+    if claims is not None:
+        return claims
+
+    try:
+        header = jwt.get_unverified_header(token)
+        claims = jwt.decode(
+            token,
+            _get_signing_key(header),
+            algorithms=[header.get('alg')],
+            audience=JWT_AUDIENCE,
+            options={"require": ["exp", "sub"]}
+        )
+    except jwt.ExpiredSignatureError:
+        raise Exception("JWT expired")
+    except jwt.PyJWTError as e:
+        raise Exception(f"Invalid token: {str(e)}")
+
+    verified_tokens.put(token_hash, claims, claims['exp'])
+    return claims
@@ -1,9 +1,14 @@
 from http.server import BaseHTTPRequestHandler
 import json
 import os
-from supabase import create_client, Client
+import sys
 
-class handler(BaseHTTPRequestHandler):
+# Shared helpers live next to the handlers
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from supabase_pool import get_auth_client
+from timing import ServerTimingMixin, span
+
+class handler(ServerTimingMixin, BaseHTTPRequestHandler):
     def do_POST(self):
         try:
             # Get Supabase credentials from environment
@@ -21,8 +26,8 @@ class handler(BaseHTTPRequestHandler):
                 self.wfile.write(json.dumps(error_result).encode())
                 return
             
-            # Initialize Supabase client
-            supabase: Client = create_client(supabase_url, supabase_key)
+            # Reuse the process-wide auth client (keeps its connection alive)
+            auth_client = get_auth_client()
             
             # Parse request body
             content_length = int(self.headers['Content-Length'])
@@ -45,10 +50,11 @@ class handler(BaseHTTPRequestHandler):
             
             # Use Supabase Auth for login
             try:
-                response = supabase.auth.sign_in_with_password({
-                    "email": email,
-                    "password": password
-                })
+                with span('sign-in'):
+                    response = auth_client.sign_in_with_password({
+                        "email": email,
+                        "password": password
+                    })
                 
                 if response.session and response.user:
                     result = {
@@ -73,13 +79,14 @@ class handler(BaseHTTPRequestHandler):
                 return
             
             # Send successful response
+            body = json.dumps(result).encode()
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
             self.send_header('Access-Control-Allow-Headers', 'Content-Type')
             self.end_headers()
-            self.wfile.write(json.dumps(result).encode())
+            self.wfile.write(body)
             
         except Exception as e:
             error_result = {"error": f"Internal server error: {str(e)}"}
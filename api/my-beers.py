@@ -1,67 +1,46 @@
 from http.server import BaseHTTPRequestHandler
 import json
 import os
-import base64
-from supabase import create_client, Client
+import sys
+import itertools
+import urllib.parse
 
-def validate_token(authorization_header):
-    """Validate JWT token and return user_id, supabase_client"""
-    if not authorization_header or not authorization_header.startswith('Bearer '):
-        raise Exception("Missing or invalid authorization header")
-    
-    token = authorization_header[7:]  # Remove 'Bearer ' prefix
-    
-    # Get Supabase credentials
-    supabase_url = os.environ.get('SUPABASE_URL')
-    supabase_key = os.environ.get('SUPABASE_ANON_KEY')
-    
-    if not supabase_url or not supabase_key:
-        raise Exception("Supabase configuration missing")
-    
-    try:
-        # Decode JWT token to get user ID
-        parts = token.split('.')
-        if len(parts) != 3:
-            raise Exception("Invalid JWT format")
-        
-        # Decode payload
-        payload_encoded = parts[1]
-        padding = 4 - len(payload_encoded) % 4
-        if padding != 4:
-            payload_encoded += '=' * padding
-            
-        payload_bytes = base64.urlsafe_b64decode(payload_encoded)
-        payload = json.loads(payload_bytes.decode('utf-8'))
-        
-        user_id = payload.get('sub')
-        if not user_id:
-            raise Exception("No user ID in token")
-        
-        # Create authenticated Supabase client
-        supabase: Client = create_client(supabase_url, supabase_key)
-        supabase.postgrest.session.headers.update({
-            "Authorization": f"Bearer {token}"
-        })
-        
-        return user_id, supabase
-        
-    except Exception as e:
-        raise Exception(f"Token validation failed: {str(e)}")
+# Shared helpers live next to the handlers
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from auth_utils import validate_token
+from pagination import fetch_page, parse_limit
+from streaming import iter_pages, json_array_chunks, start_chunked_response, write_chunks
+from timing import ServerTimingMixin, span
 
-class handler(BaseHTTPRequestHandler):
+class handler(ServerTimingMixin, BaseHTTPRequestHandler):
     def do_GET(self):
         try:
             # Validate authentication
             authorization = self.headers.get('Authorization')
             user_id, supabase = validate_token(authorization)
             
+            # Passing limit and/or cursor switches to keyset pagination
+            query_params = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+            paginated = 'limit' in query_params or 'cursor' in query_params
+            
             try:
                 # Get user's beers
-                response = supabase.table("beers").select(
-                    "id, image_url, note, created_at"
-                ).eq("user_id", user_id).order("created_at", desc=True).execute()
+                def beers_query():
+                    return supabase.table("beers").select(
+                        "id, image_url, image_variants, note, created_at"
+                    ).eq("user_id", user_id)
                 
-                result = response.data
+                if paginated:
+                    limit = parse_limit(query_params.get('limit', [None])[0])
+                    cursor = query_params.get('cursor', [None])[0]
+                    rows, next_cursor = fetch_page(beers_query(), limit, cursor)
+                    result = {"beers": rows, "next_cursor": next_cursor}
+                else:
+                    # The full list is streamed page by page; fetch the first page
+                    # up front so query errors still get a proper error response
+                    pages = iter_pages(beers_query)
+                    first_page = next(pages)
+                    result = None
                 
             except Exception as e:
                 print(f"Database query error: {e}")
@@ -75,14 +54,27 @@ class handler(BaseHTTPRequestHandler):
                 self.wfile.write(json.dumps(error_result).encode())
                 return
             
+            if result is None:
+                # Stream the full list, serializing each page as it arrives
+                chunked = start_chunked_response(self, 200)
+                self.send_header('Content-type', 'application/json')
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+                self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+                self.end_headers()
+                with span('stream'):
+                    write_chunks(self, json_array_chunks(itertools.chain([first_page], pages)), chunked)
+                return
+            
             # Send successful response
+            body = json.dumps(result).encode()
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
             self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
             self.end_headers()
-            self.wfile.write(json.dumps(result).encode())
+            self.wfile.write(body)
             
         except Exception as e:
             if "Token validation failed" in str(e) or "Invalid token" in str(e) or "JWT expired" in str(e):
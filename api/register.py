@@ -1,9 +1,14 @@
 from http.server import BaseHTTPRequestHandler
 import json
 import os
-from supabase import create_client, Client
+import sys
 
-class handler(BaseHTTPRequestHandler):
+# Shared helpers live next to the handlers
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from supabase_pool import get_auth_client
+from timing import ServerTimingMixin, span
+
+class handler(ServerTimingMixin, BaseHTTPRequestHandler):
     def do_POST(self):
         try:
             # Get Supabase credentials from environment
@@ -21,9 +26,9 @@ class handler(BaseHTTPRequestHandler):
                 self.wfile.write(json.dumps(error_result).encode())
                 return
             
-            # Initialize Supabase client
+            # Reuse the process-wide auth client (keeps its connection alive)
             try:
-                supabase: Client = create_client(supabase_url, supabase_key)
+                auth_client = get_auth_client()
             except Exception as client_error:
                 print(f"Supabase client creation failed: {client_error}")
                 error_result = {"error": f"Supabase connection failed: {str(client_error)}"}
@@ -58,15 +63,16 @@ class handler(BaseHTTPRequestHandler):
             
             # Use Supabase Auth for registration
             try:
-                response = supabase.auth.sign_up({
-                    "email": email,
-                    "password": password,
-                    "options": {
-                        "data": {
-                            "name": name
+                with span('sign-up'):
+                    response = auth_client.sign_up({
+                        "email": email,
+                        "password": password,
+                        "options": {
+                            "data": {
+                                "name": name
+                            }
                         }
-                    }
-                })
+                    })
                 
                 if response.user and response.session:
                     result = {
@@ -91,13 +97,14 @@ class handler(BaseHTTPRequestHandler):
                 return
             
             # Send successful response
+            body = json.dumps(result).encode()
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
             self.send_header('Access-Control-Allow-Headers', 'Content-Type')
             self.end_headers()
-            self.wfile.write(json.dumps(result).encode())
+            self.wfile.write(body)
             
         except Exception as e:
             error_result = {"error": f"Internal server error: {str(e)}"}
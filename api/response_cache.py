@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from single_flight import flights
+
+# Responses are served from memory for RESPONSE_CACHE_TTL seconds, then for up to
+# RESPONSE_CACHE_STALE more while one background refresh brings them up to date
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', '2'))
+RESPONSE_CACHE_STALE = float(os.environ.get('RESPONSE_CACHE_STALE', '30'))
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+# Bigger bodies aren't worth holding on to (one would crowd out everything else)
+MAX_ENTRY_BYTES = 1024 * 1024
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='response-cache')
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU of serialized responses with a TTL and stale-while-revalidate
+    Entries carry the ETag they were built for, so a refresh first compares the
+    cheap feed version and only rebuilds the body when the data changed.
+    Each Vercel function is its own instance: clear() after a write only reaches
+    handlers in the same process, the TTL and the version check cover the rest.
+    """
+
+    def __init__(self, ttl=RESPONSE_CACHE_TTL, stale=RESPONSE_CACHE_STALE, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.stale = stale
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._refreshing = set()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, etag_fn, build_fn):
+        """
+        Cached (etag, body) for key, building it on a miss
+        etag_fn() -> the current ETag (or None), build_fn() -> the body bytes.
+        A stale entry is returned as is while one refresh runs in the background.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry[3]:
+                self._entries.move_to_end(key)
+                if now >= entry[2] and key not in self._refreshing:
+                    self._refreshing.add(key)
+                    _executor.submit(self._refresh, key, entry, etag_fn, build_fn, self._generation)
+                return entry[0], entry[1]
+            generation = self._generation
+
+        def load():
+            etag = etag_fn()
+            body = build_fn()
+            self._store(key, etag, body, generation)
+            return etag, body
+
+        # Misses arriving together build the response once. The generation keeps
+        # a miss after a write from joining a build that began before it
+        return flights.do(('response', key, generation), load)
+
+    def clear(self):
+        """Drop every entry, including ones being built right now"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self._generation += 1
+
+    def _refresh(self, key, entry, etag_fn, build_fn, generation):
+        try:
+            etag = etag_fn()
+            # Same version as before: the cached body is still right
+            body = entry[1] if etag is not None and etag == entry[0] else build_fn()
+            self._store(key, etag, body, generation)
+        except Exception as refresh_error:
+            print(f"Response cache refresh failed for {key}, serving stale: {refresh_error}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _store(self, key, etag, body, generation):
+        if len(body) > MAX_ENTRY_BYTES:
+            return
+        now = time.monotonic()
+        with self._lock:
+            # A write cleared the cache while this was built from older data
+            if generation != self._generation:
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous[1])
+            self._entries[key] = (etag, body, now + self.ttl, now + self.ttl + self.stale)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted[1])
+
+
+# Module level so it survives between invocations of a warm instance
+response_cache = ResponseCache()
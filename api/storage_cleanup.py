@@ -0,0 +1,84 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from supabase import create_client
+from storage3 import SyncStorageClient
+
+BUCKET = 'beer-images'
+# Objects per storage delete request and per orphan query
+SWEEP_BATCH_SIZE = 100
+# Uploads younger than this may still be waiting for their beer row
+ORPHAN_MIN_AGE = '1 day'
+
+# Removals run here once the response is on its way. A serverless instance may
+# be frozen before they finish; anything left behind is picked up by the sweeper.
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='storage-cleanup')
+
+
+def _public_prefix():
+    return f"{os.environ.get('SUPABASE_URL', '')}/storage/v1/object/public/{BUCKET}/"
+
+
+def beer_object_paths(beer, user_id):
+    """
+    Bucket paths of a beer's photo and its resized variants
+    Only objects in the user's own folder are returned: image_url comes from
+    the client, so it may point at a placeholder or someone else's photo.
+    """
+    urls = [beer.get('image_url')]
+    for formats in (beer.get('image_variants') or {}).values():
+        urls.extend(formats.values())
+
+    prefix = _public_prefix()
+    paths = []
+    for url in urls:
+        if not url or not url.startswith(prefix):
+            continue
+        path = url[len(prefix):].split('?', 1)[0]
+        if path.split('/', 1)[0] == user_id and path not in paths:
+            paths.append(path)
+    return paths
+
+
+def remove_objects(token, paths):
+    """Delete objects from the bucket as the token's user, a batch per request"""
+    supabase_url = os.environ.get('SUPABASE_URL')
+    supabase_key = os.environ.get('SUPABASE_ANON_KEY')
+    headers = {"apiKey": supabase_key, "Authorization": f"Bearer {token}"}
+    with SyncStorageClient(f"{supabase_url}/storage/v1", headers) as storage:
+        bucket = storage.from_(BUCKET)
+        for start in range(0, len(paths), SWEEP_BATCH_SIZE):
+            bucket.remove(paths[start:start + SWEEP_BATCH_SIZE])
+
+
+def _report_failure(future):
+    error = future.exception()
+    if error is not None:
+        print(f"Storage cleanup failed, leaving it to the sweeper: {error}")
+
+
+def schedule_removal(token, paths):
+    """Delete objects in the background; the caller doesn't wait"""
+    if paths:
+        _executor.submit(remove_objects, token, paths).add_done_callback(_report_failure)
+
+
+def sweep_orphans(service_key, max_batches=10):
+    """
+    Remove bucket objects no beer references (add-storage-sweeper.sql)
+    Needs the service role key: orphans belong to every user.
+    Returns: how many objects were removed
+    """
+    supabase = create_client(os.environ.get('SUPABASE_URL'), service_key)
+    removed = 0
+    for _ in range(max_batches):
+        names = supabase.rpc('get_orphaned_beer_images', {
+            'min_age': ORPHAN_MIN_AGE,
+            'max_rows': SWEEP_BATCH_SIZE
+        }).execute().data or []
+        if not names:
+            break
+        remove_objects(service_key, names)
+        removed += len(names)
+        if len(names) < SWEEP_BATCH_SIZE:
+            break
+    return removed
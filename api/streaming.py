@@ -0,0 +1,78 @@
+import json
+from pagination import fetch_page
+from single_flight import flights
+
+# Rows fetched and serialized per chunk when streaming a whole list
+STREAM_BATCH_SIZE = 500
+
+
+def iter_pages(make_query, batch_size=STREAM_BATCH_SIZE, key=None):
+    """
+    Walk a beers select page by page with keyset pagination
+    make_query must return a fresh query builder for every page. With a key
+    naming the query, streams walking it at the same time share each page fetch.
+    """
+    cursor = None
+    while True:
+        if key is None:
+            rows, cursor = fetch_page(make_query(), batch_size, cursor)
+        else:
+            rows, cursor = flights.do(
+                (key, batch_size, cursor), lambda: fetch_page(make_query(), batch_size, cursor)
+            )
+        yield rows
+        if cursor is None:
+            return
+
+
+def json_array_chunks(pages, transform=None):
+    """Serialize pages of rows as one JSON array, yielding an encoded chunk per page"""
+    yield b'['
+    first = True
+    for rows in pages:
+        if transform:
+            rows = transform(rows)
+        if not rows:
+            continue
+        body = ','.join(json.dumps(row) for row in rows)
+        yield (body if first else ',' + body).encode()
+        first = False
+    yield b']'
+
+
+def start_chunked_response(handler, status):
+    """
+    Send the status line, Transfer-Encoding and Connection headers for a streamed body
+    The caller adds its own headers and calls end_headers(), then write_chunks().
+    Returns: whether the body must be chunk-framed (HTTP/1.1) or not (HTTP/1.0)
+    """
+    chunked = handler.request_version == 'HTTP/1.1'
+    if chunked:
+        handler.protocol_version = 'HTTP/1.1'
+    handler.send_response(status)
+    if chunked:
+        handler.send_header('Transfer-Encoding', 'chunked')
+    # The other handlers speak HTTP/1.0 and close after each response; say so,
+    # or a keep-alive client reuses the socket and its next request fails
+    handler.send_header('Connection', 'close')
+    handler.close_connection = True
+    return chunked
+
+
+def write_chunks(handler, chunks, chunked=True):
+    """Write each chunk as soon as it is produced"""
+    try:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            if chunked:
+                handler.wfile.write(f"{len(chunk):X}\r\n".encode() + chunk + b"\r\n")
+            else:
+                handler.wfile.write(chunk)
+            handler.wfile.flush()
+        if chunked:
+            handler.wfile.write(b"0\r\n\r\n")
+    except Exception as e:
+        # Headers are already out, so the status can't change. Leaving out the
+        # terminating chunk lets the client see the response was cut short.
+        print(f"Error while streaming response: {e}")
@@ -0,0 +1,118 @@
+import os
+import threading
+from gotrue import SyncGoTrueClient
+from postgrest import SyncRequestBuilder
+from supabase import create_client, Client
+
+# Clients are created lazily once per process and kept between invocations of a
+# warm instance, so their HTTP connections (and TLS sessions) stay alive.
+_lock = threading.Lock()
+_anon_client = None
+_auth_client = None
+
+
+def _get_credentials():
+    supabase_url = os.environ.get('SUPABASE_URL')
+    supabase_key = os.environ.get('SUPABASE_ANON_KEY')
+
+    if not supabase_url or not supabase_key:
+        raise Exception("Supabase configuration missing")
+
+    return supabase_url, supabase_key
+
+
+def get_client() -> Client:
+    """Shared client for anonymous reads, never carries a user's token"""
+    global _anon_client
+    if _anon_client is None:
+        with _lock:
+            if _anon_client is None:
+                supabase_url, supabase_key = _get_credentials()
+                _anon_client = create_client(supabase_url, supabase_key)
+    return _anon_client
+
+
+class _StatelessGoTrueClient(SyncGoTrueClient):
+    """
+    GoTrue client that hands sessions back without keeping them
+    It's shared by every user of the process, so a stored session would let a
+    later call without an explicit token (get_session, refresh_session) act as
+    whoever signed in last. Skipping the save also skips the refresh timer.
+    """
+
+    def _save_session(self, session):
+        pass
+
+
+def get_auth_client() -> SyncGoTrueClient:
+    """
+    Shared GoTrue client for sign up, sign in and session refresh
+    Kept apart from the data clients: signing in on a supabase Client swaps its
+    Authorization header to the new user's token for every later request.
+    Callers must always pass tokens explicitly, no session is remembered.
+    """
+    global _auth_client
+    if _auth_client is None:
+        with _lock:
+            if _auth_client is None:
+                supabase_url, supabase_key = _get_credentials()
+                _auth_client = _StatelessGoTrueClient(
+                    url=f"{supabase_url}/auth/v1",
+                    headers={
+                        "apiKey": supabase_key,
+                        "Authorization": f"Bearer {supabase_key}"
+                    },
+                    auto_refresh_token=False,
+                    persist_session=False
+                )
+    return _auth_client
+
+
+class _UserRequestBuilder(SyncRequestBuilder):
+    """Table request builder whose queries carry one user's Authorization header"""
+
+    def __init__(self, session, path, authorization):
+        super().__init__(session, path)
+        self.authorization = authorization
+
+    def _authorized(self, builder):
+        # Request headers win over the shared session's anon Authorization
+        builder.headers["Authorization"] = self.authorization
+        return builder
+
+    def select(self, *columns, **kwargs):
+        return self._authorized(super().select(*columns, **kwargs))
+
+    def insert(self, json, **kwargs):
+        return self._authorized(super().insert(json, **kwargs))
+
+    def upsert(self, json, **kwargs):
+        return self._authorized(super().upsert(json, **kwargs))
+
+    def update(self, json, **kwargs):
+        return self._authorized(super().update(json, **kwargs))
+
+    def delete(self, **kwargs):
+        return self._authorized(super().delete(**kwargs))
+
+
+class UserClient:
+    """
+    Table access as the user owning a JWT, over the shared client's connections
+    Building one is just an object and a header string: no new HTTP client per
+    request or per thread, and no header on the shared session ever changes.
+    """
+
+    def __init__(self, token):
+        self._session = get_client().postgrest.session
+        self._authorization = f"Bearer {token}"
+
+    def table(self, table_name) -> SyncRequestBuilder:
+        return _UserRequestBuilder(self._session, f"/{table_name}", self._authorization)
+
+    from_ = table
+
+
+def get_user_client(token) -> UserClient:
+    """Client whose database requests run as the user owning the given JWT"""
+    return UserClient(token)
@@ -0,0 +1,59 @@
+from http.server import BaseHTTPRequestHandler
+import hmac
+import json
+import os
+import sys
+from supabase import create_client
+
+# Shared helpers live next to the handlers
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from storage_cleanup import sweep_orphans
+from timing import ServerTimingMixin, span
+
+class handler(ServerTimingMixin, BaseHTTPRequestHandler):
+    """Removes orphaned beer photos and prunes the beer change log; run daily by the Vercel cron in vercel.json"""
+
+    def do_GET(self):
+        try:
+            # Vercel sends the project's CRON_SECRET as a bearer token
+            cron_secret = os.environ.get('CRON_SECRET')
+            service_key = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
+
+            if not cron_secret or not service_key:
+                self.send_error(500, "Sweeper configuration missing")
+                return
+
+            authorization = self.headers.get('Authorization') or ''
+            if not hmac.compare_digest(authorization.encode(), f"Bearer {cron_secret}".encode()):
+                error_result = {"error": "Unauthorized"}
+                self.send_response(401)
+                self.send_header('Content-type', 'application/json')
+                self.end_headers()
+                self.wfile.write(json.dumps(error_result).encode())
+                return
+
+            with span('sweep'):
+                removed = sweep_orphans(service_key)
+            print(f"Storage sweep removed {removed} orphaned objects")
+
+            # Delta sync cursors older than the retention get a 410 and refetch
+            with span('prune-changes'):
+                pruned = create_client(os.environ.get('SUPABASE_URL'), service_key).rpc(
+                    'prune_beer_changes', {}
+                ).execute().data
+            print(f"Pruned {pruned} beer change log entries")
+
+            result = {"removed": removed, "pruned_changes": pruned}
+
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps(result).encode())
+
+        except Exception as e:
+            print(f"Storage sweep error: {e}")
+            error_result = {"error": f"Storage sweep failed: {str(e)}"}
+            self.send_response(500)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps(error_result).encode())
@@ -0,0 +1,87 @@
+import os
+import json
+import time
+import contextvars
+from contextlib import contextmanager, nullcontext
+
+# Opt-in: SERVER_TIMING=1 adds a Server-Timing header and a log line per request.
+# When off, span() hands back one shared no-op context manager.
+ENABLED = os.environ.get('SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
+
+_current = contextvars.ContextVar('request_timer', default=None)
+_NO_SPAN = nullcontext()
+
+
+class RequestTimer:
+    """Named spans of one request, in the order they finished"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+
+    @contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append((name, (time.perf_counter() - started) * 1000))
+
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def header_value(self):
+        """Server-Timing value; spans still running when headers go out are left to the log line"""
+        parts = [f"{name};dur={duration:.1f}" for name, duration in self.spans]
+        parts.append(f"total;dur={self.total_ms():.1f}")
+        return ', '.join(parts)
+
+    def log(self, method, path, status):
+        print(json.dumps({
+            "event": "request_timing",
+            "method": method,
+            "path": path.split('?', 1)[0],
+            "status": status,
+            "total_ms": round(self.total_ms(), 2),
+            "spans": [[name, round(duration, 2)] for name, duration in self.spans]
+        }))
+
+
+def start_request():
+    """Begin timing the current request; returns its timer, or None when disabled"""
+    if not ENABLED:
+        return None
+    timer = RequestTimer()
+    _current.set(timer)
+    return timer
+
+
+def span(name):
+    """Time a block as part of the current request (no-op when timing is off)"""
+    timer = _current.get()
+    return timer.span(name) if timer is not None else _NO_SPAN
+
+
+class ServerTimingMixin:
+    """
+    Mix into a BaseHTTPRequestHandler (listed before it) to time each request
+    The Server-Timing header is added to whatever response the handler sends.
+    """
+
+    def handle_one_request(self):
+        self._timer = start_request()
+        self._timing_status = None
+        try:
+            super().handle_one_request()
+        finally:
+            if self._timer is not None and getattr(self, 'command', None):
+                self._timer.log(self.command, self.path, self._timing_status)
+
+    def send_response(self, code, message=None):
+        self._timing_status = code
+        super().send_response(code, message)
+
+    def end_headers(self):
+        if getattr(self, '_timer', None) is not None:
+            self.send_header('Server-Timing', self._timer.header_value())
+        super().end_headers()
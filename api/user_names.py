@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+from timing import span
+
+# Names rarely change, so warm serverless instances can keep them for a while
+NAME_CACHE_TTL_SECONDS = 300
+NAME_CACHE_MAX_ENTRIES = 5000
+
+
+class NameCache:
+    """Small thread-safe LRU of user_id -> name with a per-entry TTL"""
+
+    def __init__(self, max_entries=NAME_CACHE_MAX_ENTRIES, ttl=NAME_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, user_ids):
+        """Return (found, missing) where found maps cached ids to their name (or None)"""
+        now = time.monotonic()
+        found = {}
+        missing = []
+        with self._lock:
+            for user_id in user_ids:
+                entry = self._entries.get(user_id)
+                if entry is None or entry[1] <= now:
+                    self._entries.pop(user_id, None)
+                    missing.append(user_id)
+                    continue
+                self._entries.move_to_end(user_id)
+                found[user_id] = entry[0]
+        return found, missing
+
+    def set_many(self, names):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for user_id, name in names.items():
+                self._entries[user_id] = (name, expires_at)
+                self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Module level so it survives between invocations of a warm instance
+name_cache = NameCache()
+
+
+def resolve_user_names(supabase, user_ids):
+    """
+    Resolve display names for a collection of user ids
+    Uses the shared cache first and a single get_user_names RPC for the rest.
+    Returns: dict of user_id -> name for users that have one
+    """
+    unique_ids = list(dict.fromkeys(user_ids))
+    cached, missing = name_cache.get_many(unique_ids)
+
+    if missing:
+        try:
+            with span('user-names'):
+                response = supabase.rpc('get_user_names', {'user_ids': missing}).execute()
+            fetched = response.data or {}
+        except Exception as rpc_error:
+            # Don't cache failures, the next request will retry
+            print(f"RPC error resolving {len(missing)} user names: {rpc_error}")
+            fetched = None
+
+        if fetched is not None:
+            # Cache misses as None too so unnamed users don't trigger a lookup every time
+            resolved = {user_id: fetched.get(user_id) for user_id in missing}
+            name_cache.set_many(resolved)
+            cached.update(resolved)
+
+    return {user_id: name for user_id, name in cached.items() if name}
+
+
+def add_user_names(supabase, rows):
+    """Shape beer rows for the feed, resolving every author's name in one batched (and cached) RPC call"""
+    user_names = resolve_user_names(supabase, [beer["user_id"] for beer in rows])
+
+    beers = []
+    for beer in rows:
+        beers.append({
+            "id": beer["id"],
+            "image_url": beer["image_url"],
+            "image_variants": beer["image_variants"],
+            "note": beer["note"],
+            "created_at": beer["created_at"],
+            "user_id": beer["user_id"],
+            "user_name": user_names.get(beer["user_id"], "Unknown User")
+        })
+    return beers
@@ -0,0 +1,32 @@
+import os
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+# Blocking Supabase calls that may be in flight at once per worker
+DB_WORKERS = int(os.getenv("DB_WORKERS", "32"))
+
+# Threads are only started as calls need them
+_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="supabase")
+
+
+async def run_sync(fn, *args, **kwargs):
+    """
+    Run a blocking supabase-py call on the bounded pool
+    The event loop keeps serving other requests while the call waits on the network.
+    The caller's context (e.g. its request timer) carries over to the worker thread.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(context.run, fn, *args, **kwargs))
+
+
+async def execute(query):
+    """Async query.execute()"""
+    return await run_sync(query.execute)
+
+
+async def gather(*calls):
+    """Run independent blocking calls concurrently; results come back in order"""
+    return await asyncio.gather(*(run_sync(call) for call in calls))
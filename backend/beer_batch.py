@@ -0,0 +1,101 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+# Beers one batch may carry (an offline queue from a long night)
+MAX_BATCH_SIZE = 50
+MAX_NOTE_LENGTH = 250
+# Offline beers keep the time they were logged, within reason
+MAX_BACKDATE = timedelta(days=7)
+CLOCK_SKEW = timedelta(minutes=5)
+DEFAULT_IMAGE_URL = 'https://images.unsplash.com/photo-1558618666-fcd25c85cd64?w=300&h=200&fit=crop&q=80'
+
+
+def _parse_created_at(value, now):
+    """Client timestamp as an aware datetime, or raises ValueError"""
+    if not isinstance(value, str):
+        raise ValueError("created_at must be an ISO 8601 string")
+    created_at = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if created_at.tzinfo is None:
+        raise ValueError("created_at needs a timezone")
+    if created_at > now + CLOCK_SKEW or created_at < now - MAX_BACKDATE:
+        raise ValueError("created_at must be within the last 7 days")
+    return created_at
+
+
+def validate_batch(items, user_id, now=None):
+    """
+    Check every item of a batch on its own
+    Returns: (rows, results) where rows are the valid items as beers rows to
+    insert and results has one entry per item, in order; valid items are
+    marked "pending" until finish_results() knows what the insert did.
+    """
+    now = now or datetime.now(timezone.utc)
+    rows = []
+    results = []
+    seen_ids = set()
+    for item in items:
+        client_id = item.get('id') if isinstance(item, dict) else None
+        result = {"id": client_id, "status": "invalid"}
+        results.append(result)
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("Each beer must be an object")
+            try:
+                beer_id = str(uuid.UUID(client_id))
+            except (TypeError, ValueError, AttributeError):
+                raise ValueError("id must be a client-generated UUID")
+            if beer_id in seen_ids:
+                raise ValueError("id appears more than once in the batch")
+
+            note = item.get('note')
+            note = note.strip() if isinstance(note, str) else ''
+            if not note:
+                raise ValueError("Please add a description for your beer")
+            if len(note) > MAX_NOTE_LENGTH:
+                raise ValueError(f"Description must be {MAX_NOTE_LENGTH} characters or less")
+
+            image_url = item.get('image_url') or DEFAULT_IMAGE_URL
+            if not isinstance(image_url, str):
+                raise ValueError("image_url must be a string")
+
+            created_at = item.get('created_at')
+            created_at = _parse_created_at(created_at, now) if created_at else now
+        except (TypeError, ValueError) as error:
+            result["error"] = str(error)
+            continue
+
+        seen_ids.add(beer_id)
+        result["status"] = "pending"
+        rows.append({
+            "id": beer_id,
+            "user_id": user_id,
+            "image_url": image_url,
+            "note": note,
+            "created_at": created_at.isoformat()
+        })
+    return rows, results
+
+
+def skipped_ids(rows, inserted_ids):
+    """Ids of valid rows the insert skipped because a beer with that id already exists"""
+    return [row["id"] for row in rows if row["id"] not in inserted_ids]
+
+
+def finish_results(results, inserted_ids, owned_ids):
+    """
+    Settle the pending results once the insert has run
+    A skipped row the user owns is a retried sync, so it counts as synced for
+    the client too. Any other skipped id belongs to someone else's beer.
+    """
+    for result in results:
+        if result["status"] != "pending":
+            continue
+        beer_id = str(uuid.UUID(result["id"]))
+        if beer_id in inserted_ids:
+            result["status"] = "created"
+        elif beer_id in owned_ids:
+            result["status"] = "already_exists"
+        else:
+            result["status"] = "conflict"
+            result["error"] = "id is already used by another beer"
+    return results
@@ -0,0 +1,373 @@
+import os
+import re
+import json
+import mmap
+import zlib
+import struct
+import threading
+from array import array
+from concurrent.futures import Future
+from beer_store import BeerStore
+
+# Log records kept before they are folded into a new snapshot
+SNAPSHOT_EVERY = int(os.getenv("SNAPSHOT_EVERY", "100000"))
+
+SNAPSHOT_MAGIC = b"BEERSNP1"
+# magic, beer count, then offsets of: record offsets, id order, user index, meta (and its length)
+SNAPSHOT_HEADER = struct.Struct("<8s6Q")
+# Each log record is framed as payload length + crc32, then the JSON payload
+LOG_FRAME = struct.Struct("<II")
+
+SNAPSHOT_PATTERN = re.compile(r"^snapshot-(\d{8})\.bin$")
+LOG_PATTERN = re.compile(r"^log-(\d{8})\.log$")
+
+
+def _snapshot_path(data_dir, generation):
+    return os.path.join(data_dir, f"snapshot-{generation:08d}.bin")
+
+
+def _log_path(data_dir, generation):
+    return os.path.join(data_dir, f"log-{generation:08d}.log")
+
+
+def _generations(data_dir, pattern):
+    return sorted(int(match.group(1)) for match in map(pattern.match, os.listdir(data_dir)) if match)
+
+
+def _fsync_dir(data_dir):
+    fd = os.open(data_dir, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+_encoder = json.JSONEncoder(separators=(",", ":"))
+
+
+def _encode(record):
+    return _encoder.encode(record).encode("utf-8")
+
+
+class SnapshotSegment:
+    """
+    Read-only view of a snapshot file through mmap
+    Opening it parses only the header and the users; beers are decoded on
+    access, so startup time does not grow with the number of beers.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count, offsets_at, id_order_at, user_index_at, meta_at, meta_len = SNAPSHOT_HEADER.unpack_from(self._mm)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"Not a snapshot: {path}")
+
+        # Zero-copy integer arrays straight over the mapping
+        view = memoryview(self._mm)
+        self._count = count
+        self._offsets = view[offsets_at:offsets_at + (count + 1) * 8].cast("Q")
+        self._id_order = view[id_order_at:id_order_at + count * 4].cast("I")
+        self._user_index = view[user_index_at:meta_at].cast("I")
+
+        meta = json.loads(self._mm[meta_at:meta_at + meta_len])
+        self.users = meta["users"]
+        self.next_user_id = meta["next_user_id"]
+        self.next_beer_id = meta["next_beer_id"]
+        self._user_ranges = meta["user_ranges"]
+
+    def __len__(self):
+        return self._count
+
+    def record(self, index):
+        return json.loads(self._mm[self._offsets[index]:self._offsets[index + 1]])
+
+    def get(self, beer_id):
+        # Binary search over the records sorted by id
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            beer = self.record(self._id_order[mid])
+            if beer["id"] < beer_id:
+                lo = mid + 1
+            elif beer["id"] > beer_id:
+                hi = mid
+            else:
+                return beer
+        return None
+
+    def _positions(self, user_id):
+        """Record indices in timeline order, for everyone or one user"""
+        if user_id is None:
+            return range(self._count)
+        start, count = self._user_ranges.get(user_id, (0, 0))
+        return self._user_index[start:start + count]
+
+    def iter_before(self, after=None, user_id=None):
+        """(key, beer) newest first, strictly below the (created_at, id) key after"""
+        positions = self._positions(user_id)
+        hi = len(positions)
+        if after is not None:
+            lo = 0
+            while lo < hi:
+                mid = (lo + hi) // 2
+                beer = self.record(positions[mid])
+                if (beer["created_at"], beer["id"]) < after:
+                    lo = mid + 1
+                else:
+                    hi = mid
+
+        for position in range(hi - 1, -1, -1):
+            beer = self.record(positions[position])
+            yield (beer["created_at"], beer["id"]), beer
+
+    def __iter__(self):
+        """(key, beer) oldest first"""
+        for index in range(self._count):
+            beer = self.record(index)
+            yield (beer["created_at"], beer["id"]), beer
+
+
+def write_snapshot(path, captured):
+    """Merge the captured base and recent beers into a new snapshot file"""
+    base = captured["base"]
+    base_deleted = captured["base_deleted"]
+    older = iter(()) if base is None else (item for item in base if item[1]["id"] not in base_deleted)
+
+    offsets = []
+    ids = []
+    user_positions = {}
+    partial_path = f"{path}.tmp"
+    with open(partial_path, "wb") as f:
+        f.write(b"\0" * SNAPSHOT_HEADER.size)
+
+        # Both sources are ascending and disjoint, so a merge keeps timeline order
+        recent = iter(captured["recent"])
+        pending = [next(older, None), next(recent, None)]
+        position = SNAPSHOT_HEADER.size
+        while pending[0] or pending[1]:
+            source = 0 if pending[1] is None or (pending[0] and pending[0][0] < pending[1][0]) else 1
+            _, beer = pending[source]
+            pending[source] = next(older if source == 0 else recent, None)
+
+            data = _encode(beer)
+            offsets.append(position)
+            ids.append(beer["id"])
+            user_positions.setdefault(beer["user_id"], []).append(len(offsets) - 1)
+            f.write(data)
+            position += len(data)
+        offsets.append(position)
+
+        def align():
+            f.write(b"\0" * (-f.tell() % 8))
+
+        align()
+        offsets_at = f.tell()
+        f.write(array("Q", offsets).tobytes())
+        id_order_at = f.tell()
+        f.write(array("I", sorted(range(len(ids)), key=ids.__getitem__)).tobytes())
+        align()
+
+        user_index_at = f.tell()
+        user_ranges = {}
+        start = 0
+        for user_id, positions in user_positions.items():
+            f.write(array("I", positions).tobytes())
+            user_ranges[user_id] = [start, len(positions)]
+            start += len(positions)
+        align()
+
+        meta_at = f.tell()
+        meta = _encode({
+            "users": captured["users"],
+            "user_ranges": user_ranges,
+            "next_user_id": captured["next_user_id"],
+            "next_beer_id": captured["next_beer_id"]
+        })
+        f.write(meta)
+
+        f.seek(0)
+        f.write(SNAPSHOT_HEADER.pack(
+            SNAPSHOT_MAGIC, len(ids), offsets_at, id_order_at, user_index_at, meta_at, len(meta)
+        ))
+        f.flush()
+        os.fsync(f.fileno())
+
+    os.replace(partial_path, path)
+    _fsync_dir(os.path.dirname(path))
+
+
+class Journal:
+    """
+    Append-only record log with group-committed fsync
+    append() only writes to the file buffer. A flusher thread fsyncs whatever
+    has accumulated, so writers that arrive during one fsync share the next.
+    """
+
+    def __init__(self, data_dir, generation, on_full=None):
+        self.data_dir = data_dir
+        self.generation = generation
+        self.records = 0
+        self._on_full = on_full
+        self._file = open(_log_path(data_dir, generation), "ab")
+        self._appended = 0
+        self._durable = 0
+        self._waiters = []
+        self._closed = False
+        self._cond = threading.Condition()
+        self._flusher = threading.Thread(target=self._flush_loop, name="journal-flusher", daemon=True)
+        self._flusher.start()
+
+    def append(self, record):
+        payload = _encode(record)
+        with self._cond:
+            self._file.write(LOG_FRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+            self._appended += 1
+            self.records += 1
+            full = self.records % SNAPSHOT_EVERY == 0
+        if full and self._on_full:
+            self._on_full()
+
+    def sync(self):
+        """Future resolved once everything appended so far has been fsynced"""
+        future = Future()
+        with self._cond:
+            if self._durable >= self._appended:
+                future.set_result(None)
+            else:
+                self._waiters.append((self._appended, future))
+                self._cond.notify()
+        return future
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._waiters and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._waiters:
+                    return
+                target = self._appended
+                self._file.flush()
+                # A duplicate descriptor stays valid even if rotate() closes the file
+                fd = os.dup(self._file.fileno())
+
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+            with self._cond:
+                self._durable = max(self._durable, target)
+                ready = [future for seq, future in self._waiters if seq <= self._durable]
+                self._waiters = [(seq, future) for seq, future in self._waiters if seq > self._durable]
+            for future in ready:
+                future.set_result(None)
+
+    def rotate(self):
+        """Start the next log file; returns its generation"""
+        with self._cond:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self.generation += 1
+            self.records = 0
+            self._file = open(_log_path(self.data_dir, self.generation), "ab")
+            _fsync_dir(self.data_dir)
+            return self.generation
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._flusher.join()
+        with self._cond:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+
+def replay_log(store, path):
+    """Apply every intact record; a torn tail from a crash is cut off"""
+    with open(path, "rb") as f:
+        data = f.read()
+
+    position = 0
+    while position + LOG_FRAME.size <= len(data):
+        length, checksum = LOG_FRAME.unpack_from(data, position)
+        payload = data[position + LOG_FRAME.size:position + LOG_FRAME.size + length]
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            break
+        record = json.loads(payload)
+        if record["op"] == "user":
+            store.apply_user(record["user"])
+        elif record["op"] == "beer":
+            store.apply_beer(record["beer"])
+        elif record["op"] == "delete":
+            store.apply_delete(record["id"])
+        position += LOG_FRAME.size + length
+
+    if position < len(data):
+        print(f"Truncating {len(data) - position} bytes of incomplete log records in {path}")
+        with open(path, "r+b") as f:
+            f.truncate(position)
+            os.fsync(f.fileno())
+
+
+class PersistentStore:
+    """Loads a BeerStore from disk, journals its changes and compacts the journal into snapshots"""
+
+    def __init__(self, data_dir):
+        os.makedirs(data_dir, exist_ok=True)
+        self.data_dir = data_dir
+        self.store = BeerStore()
+        self._compacting = threading.Lock()
+
+        snapshots = _generations(data_dir, SNAPSHOT_PATTERN)
+        generation = snapshots[-1] if snapshots else 0
+        if snapshots:
+            base = SnapshotSegment(_snapshot_path(data_dir, generation))
+            self.store.base = base
+            for user in base.users.values():
+                self.store.apply_user(user)
+            self.store._next_user_id = max(self.store._next_user_id, base.next_user_id)
+            self.store._next_beer_id = max(self.store._next_beer_id, base.next_beer_id)
+
+        # Snapshot N holds everything logged before log N
+        logs = [log for log in _generations(data_dir, LOG_PATTERN) if log >= generation]
+        for log in logs:
+            replay_log(self.store, _log_path(data_dir, log))
+
+        self.journal = Journal(data_dir, logs[-1] if logs else generation, on_full=self.compact_in_background)
+        self.store.journal = self.journal
+
+    def compact_in_background(self):
+        threading.Thread(target=self.compact, name="snapshot-writer", daemon=True).start()
+
+    def compact(self):
+        """Fold the current log into a new snapshot, then drop the files it replaces"""
+        if not self._compacting.acquire(blocking=False):
+            return
+        try:
+            # Rotating under the store lock makes the capture match the log boundary
+            with self.store._lock:
+                generation = self.journal.rotate()
+                captured = self.store.capture()
+
+            path = _snapshot_path(self.data_dir, generation)
+            write_snapshot(path, captured)
+            self.store.install_base(SnapshotSegment(path), captured)
+
+            for old in _generations(self.data_dir, SNAPSHOT_PATTERN):
+                if old < generation:
+                    os.remove(_snapshot_path(self.data_dir, old))
+            for old in _generations(self.data_dir, LOG_PATTERN):
+                if old < generation:
+                    os.remove(_log_path(self.data_dir, old))
+        except Exception as e:
+            print(f"Error writing snapshot: {e}")
+        finally:
+            self._compacting.release()
+
+    def close(self):
+        self.journal.close()
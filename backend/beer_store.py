@@ -0,0 +1,245 @@
+import bisect
+import heapq
+import asyncio
+import itertools
+import threading
+
+# Keys per sublist before it is split; keeps every insert/remove shift short
+SUBLIST_SIZE = 512
+
+
+class SortedKeyList:
+    """
+    Sorted list of keys split into bounded sublists
+    Inserts and removes bisect the sublist maxes, then a sublist, so they cost
+    O(log n) with at most SUBLIST_SIZE * 2 elements shifted.
+    """
+
+    def __init__(self):
+        self._lists = []
+        self._maxes = []
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def add(self, key):
+        if not self._maxes:
+            self._lists.append([key])
+            self._maxes.append(key)
+        else:
+            pos = bisect.bisect_left(self._maxes, key)
+            if pos == len(self._maxes):
+                # Newest key: the common case, an append to the last sublist
+                pos -= 1
+                self._lists[pos].append(key)
+                self._maxes[pos] = key
+            else:
+                bisect.insort(self._lists[pos], key)
+
+            sub = self._lists[pos]
+            if len(sub) > SUBLIST_SIZE * 2:
+                self._lists[pos:pos + 1] = [sub[:SUBLIST_SIZE], sub[SUBLIST_SIZE:]]
+                self._maxes[pos:pos + 1] = [sub[SUBLIST_SIZE - 1], sub[-1]]
+        self._len += 1
+
+    def remove(self, key):
+        pos = bisect.bisect_left(self._maxes, key)
+        if pos == len(self._maxes):
+            raise KeyError(key)
+        sub = self._lists[pos]
+        index = bisect.bisect_left(sub, key)
+        if index == len(sub) or sub[index] != key:
+            raise KeyError(key)
+
+        del sub[index]
+        self._len -= 1
+        if sub:
+            self._maxes[pos] = sub[-1]
+        else:
+            del self._lists[pos]
+            del self._maxes[pos]
+
+    def iter_before(self, key=None):
+        """Keys in descending order, strictly below key (from the largest when None)"""
+        if not self._lists:
+            return
+        pos = len(self._lists) - 1 if key is None else bisect.bisect_left(self._maxes, key)
+        if pos == len(self._lists):
+            pos -= 1
+        sub = self._lists[pos]
+        index = len(sub) if key is None else bisect.bisect_left(sub, key)
+
+        while True:
+            for i in range(index - 1, -1, -1):
+                yield sub[i]
+            pos -= 1
+            if pos < 0:
+                return
+            sub = self._lists[pos]
+            index = len(sub)
+
+
+def _id_number(record_id):
+    return int(record_id.rsplit("_", 1)[1])
+
+
+class BeerStore:
+    """
+    In-memory users and beers with the indexes the API reads through
+    beers: id -> record; timelines: (created_at, id) keys for everyone and per
+    user, so a page is a bisect plus O(limit) steps; usernames: username -> user id.
+
+    With persistence enabled (see beer_persistence) older beers live in base, an
+    immutable mmapped snapshot, and this store only holds what changed since:
+    beers added after it and tombstones for base beers deleted after it. Every
+    change is also handed to journal, which makes it durable.
+    """
+
+    def __init__(self):
+        self.users = {}
+        self.usernames = {}
+        self.beers = {}
+        self.base = None
+        self.journal = None
+        self._base_deleted = set()
+        self._timeline = SortedKeyList()
+        self._user_timelines = {}
+        self._next_user_id = 1
+        self._next_beer_id = 1
+        self._lock = threading.RLock()
+
+    def add_user(self, username, name, password):
+        with self._lock:
+            if username in self.usernames:
+                raise ValueError("Username already taken")
+            user = {
+                "id": f"user_{self._next_user_id}",
+                "username": username,
+                "name": name,
+                "password": password  # In production, this should be hashed
+            }
+            self.apply_user(user)
+            self._log({"op": "user", "user": user})
+            return user
+
+    def find_user(self, username):
+        user_id = self.usernames.get(username)
+        return self.users.get(user_id) if user_id else None
+
+    def add_beer(self, beer):
+        """Store a beer (without an id) and return it with its new id"""
+        with self._lock:
+            beer = {"id": f"beer_{self._next_beer_id}", **beer}
+            self.apply_beer(beer)
+            self._log({"op": "beer", "beer": beer})
+            return beer
+
+    def get_beer(self, beer_id):
+        beer = self.beers.get(beer_id)
+        if beer is None and self.base is not None and beer_id not in self._base_deleted:
+            beer = self.base.get(beer_id)
+        return beer
+
+    def delete_beer(self, beer_id, user_id):
+        """Remove a beer owned by user_id; returns the removed record or None"""
+        with self._lock:
+            beer = self.get_beer(beer_id)
+            if not beer or beer["user_id"] != user_id:
+                return None
+            self.apply_delete(beer_id)
+            self._log({"op": "delete", "id": beer_id})
+            return beer
+
+    # apply_* change memory only; used directly when replaying the journal
+
+    def apply_user(self, user):
+        self.users[user["id"]] = user
+        self.usernames[user["username"]] = user["id"]
+        self._next_user_id = max(self._next_user_id, _id_number(user["id"]) + 1)
+
+    def apply_beer(self, beer):
+        key = (beer["created_at"], beer["id"])
+        self.beers[beer["id"]] = beer
+        self._timeline.add(key)
+        self._user_timelines.setdefault(beer["user_id"], SortedKeyList()).add(key)
+        self._next_beer_id = max(self._next_beer_id, _id_number(beer["id"]) + 1)
+
+    def apply_delete(self, beer_id):
+        beer = self.beers.pop(beer_id, None)
+        if beer is None:
+            self._base_deleted.add(beer_id)
+            return
+        key = (beer["created_at"], beer["id"])
+        self._timeline.remove(key)
+        self._user_timelines[beer["user_id"]].remove(key)
+
+    def _log(self, record):
+        # Appended under the lock, so the journal order is the order changes were applied
+        if self.journal is not None:
+            self.journal.append(record)
+
+    async def sync(self):
+        """Wait until every change made so far is durable (no-op without a journal)"""
+        if self.journal is not None:
+            await asyncio.wrap_future(self.journal.sync())
+
+    def _keys(self, user_id):
+        if user_id is None:
+            return self._timeline
+        return self._user_timelines.get(user_id) or SortedKeyList()
+
+    def _iter_before(self, after, user_id):
+        """(key, beer) newest first across memory and the base snapshot"""
+        recent = ((key, self.beers[key[1]]) for key in self._keys(user_id).iter_before(after))
+        if self.base is None:
+            return recent
+        older = (
+            (key, beer) for key, beer in self.base.iter_before(after, user_id)
+            if beer["id"] not in self._base_deleted
+        )
+        return heapq.merge(recent, older, key=lambda item: item[0], reverse=True)
+
+    def page(self, limit, after=None, user_id=None):
+        """
+        Beers newest first, starting just after the (created_at, id) key after
+        Returns: (rows, has_more)
+        """
+        with self._lock:
+            items = list(itertools.islice(self._iter_before(after, user_id), limit + 1))
+            return [beer for _, beer in items[:limit]], len(items) > limit
+
+    def iter_beers(self, user_id=None):
+        """Every beer newest first, without sorting"""
+        with self._lock:
+            return [beer for _, beer in self._iter_before(None, user_id)]
+
+    def capture(self):
+        """
+        Freeze the current state for a snapshot; call with the journal rotated
+        under the same lock so the snapshot lines up with a log boundary
+        """
+        with self._lock:
+            return {
+                "users": dict(self.users),
+                "base": self.base,
+                "base_deleted": set(self._base_deleted),
+                "recent": [(key, self.beers[key[1]]) for key in self._timeline.iter_before()][::-1],
+                "next_user_id": self._next_user_id,
+                "next_beer_id": self._next_beer_id
+            }
+
+    def install_base(self, base, captured):
+        """Swap in a snapshot written from captured, keeping changes made since"""
+        with self._lock:
+            captured_ids = {beer["id"] for _, beer in captured["recent"]}
+            # Captured beers deleted while the snapshot was written are in it, so
+            # they become tombstones; base tombstones already applied drop out
+            deleted = (self._base_deleted - captured["base_deleted"]) | (captured_ids - self.beers.keys())
+            for beer_id in captured_ids & self.beers.keys():
+                beer = self.beers.pop(beer_id)
+                key = (beer["created_at"], beer["id"])
+                self._timeline.remove(key)
+                self._user_timelines[beer["user_id"]].remove(key)
+            self._base_deleted = deleted
+            self.base = base
@@ -0,0 +1,117 @@
+import os
+import json
+import asyncio
+
+# How often the shared watcher reads the beer change log while anyone is listening
+FEED_POLL_SECONDS = float(os.getenv("FEED_POLL_SECONDS", "2"))
+# Events buffered per client; a client that falls further behind is told to resync
+FEED_CLIENT_BUFFER = int(os.getenv("FEED_CLIENT_BUFFER", "100"))
+# Comment frames keep idle connections open through proxies
+HEARTBEAT_SECONDS = 15
+
+
+def sse_frame(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+RETRY_FRAME = b"retry: 5000\n\n"
+HEARTBEAT_FRAME = b": ping\n\n"
+RESYNC_FRAME = sse_frame("resync", {})
+
+
+class Subscriber:
+    """One connected client: a bounded queue of encoded frames"""
+
+    def __init__(self, buffer_size):
+        self.queue = asyncio.Queue(buffer_size)
+        self.lagged = False
+
+    def push(self, frame):
+        if self.lagged:
+            return
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # Too slow to keep up: drop the backlog, tell it to refetch and hang up
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_FRAME)
+            self.lagged = True
+
+
+class FeedHub:
+    """
+    Fans feed changes out to every Server-Sent Events client of this process
+    One watcher task, running only while someone listens, reads the beer change
+    log from its cursor and publishes each change once for all clients. Writes
+    made through this process nudge it so their events go out right away.
+    """
+
+    def __init__(self, fetch_changes, poll_interval=FEED_POLL_SECONDS, buffer_size=FEED_CLIENT_BUFFER):
+        # fetch_changes(cursor) -> pagination.fetch_changes() result with feed-shaped beers
+        self.fetch_changes = fetch_changes
+        self.poll_interval = poll_interval
+        self.buffer_size = buffer_size
+        self.subscribers = set()
+        self._watcher = None
+        self._nudged = None
+
+    def publish(self, frame):
+        for subscriber in self.subscribers:
+            subscriber.push(frame)
+
+    def nudge(self):
+        """Beers changed through this process: check now instead of at the next poll"""
+        if self._nudged is not None:
+            self._nudged.set()
+
+    async def stream(self):
+        """Encoded SSE frames for one client, until it disconnects or lags"""
+        subscriber = Subscriber(self.buffer_size)
+        self.subscribers.add(subscriber)
+        if self._watcher is None or self._watcher.done():
+            self._nudged = asyncio.Event()
+            self._watcher = asyncio.create_task(self._watch())
+        try:
+            yield RETRY_FRAME
+            while True:
+                try:
+                    frame = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT_FRAME
+                    continue
+                yield frame
+                if subscriber.lagged and subscriber.queue.empty():
+                    return
+        finally:
+            self.subscribers.discard(subscriber)
+
+    async def _watch(self):
+        cursor = None
+        while self.subscribers:
+            try:
+                if cursor is None:
+                    cursor = (await self.fetch_changes(None))["next_cursor"]
+
+                while True:
+                    changes = await self.fetch_changes(cursor)
+                    if changes["expired"]:
+                        # Fell behind the log's retention: start over from now
+                        self.publish(RESYNC_FRAME)
+                        cursor = None
+                        break
+                    for beer in reversed(changes["beers"]):
+                        self.publish(sse_frame("beer_inserted", beer))
+                    for beer_id in changes["deleted"]:
+                        self.publish(sse_frame("beer_deleted", {"id": beer_id}))
+                    cursor = changes["next_cursor"]
+                    if not changes["has_more"]:
+                        break
+            except Exception as watch_error:
+                print(f"Feed watcher error, retrying: {watch_error}")
+
+            try:
+                await asyncio.wait_for(self._nudged.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._nudged.clear()
@@ -0,0 +1,78 @@
+import io
+import os
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Longest edge in pixels for each variant, smallest first
+VARIANT_SIZES = {
+    "thumb": 160,
+    "feed": 640,
+    "full": 1600,
+}
+
+# ext -> (Pillow format, content type, encoder options)
+VARIANT_FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class InvalidImageError(Exception):
+    pass
+
+
+def process_image(data):
+    """
+    Build the size ladder for an uploaded photo
+    Applies the EXIF orientation, then re-encodes without any metadata (EXIF,
+    GPS, ICC) since only encoder options given to save() are written.
+    data is the image bytes or the path of a spooled upload.
+    Returns: list of (variant, ext, content_type, bytes)
+    """
+    try:
+        with Image.open(io.BytesIO(data) if isinstance(data, bytes) else data) as source:
+            image = ImageOps.exif_transpose(source)
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise InvalidImageError(f"Invalid image: {str(e)}")
+
+    variants = []
+    for variant, size in VARIANT_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        for ext, (image_format, content_type, options) in VARIANT_FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, image_format, **options)
+            variants.append((variant, ext, content_type, buffer.getvalue()))
+    return variants
+
+
+def get_pool():
+    """Process pool shared by all requests, created on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = int(os.getenv("IMAGE_WORKERS", "0")) or None
+                _pool = ProcessPoolExecutor(max_workers=workers)
+    return _pool
+
+
+async def process_upload(data):
+    """Run process_image in the pool so decoding and encoding don't block the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(), process_image, data)
+
+
+def variant_urls(variants, url_for):
+    """Map (variant, ext) uploads to {"thumb": {"webp": url, "jpg": url}, ...}"""
+    urls = {}
+    for variant, ext, _, _ in variants:
+        urls.setdefault(variant, {})[ext] = url_for(variant, ext)
+    return urls
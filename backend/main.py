@@ -1,12 +1,29 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, Request, Response, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
 import os
+import json
+import uuid
+import itertools
+import functools
 from datetime import datetime
 from supabase import create_client, Client
 from dotenv import load_dotenv
+from pagination import fetch_page, fetch_changes, parse_limit
+from streaming import iter_pages, json_array_chunks
+from conditional import feed_etag, etag_matches, REVALIDATE_CACHE_CONTROL
+from jwt_verify import verify_jwt
+from image_pipeline import process_upload, variant_urls, InvalidImageError
+from async_db import run_sync, execute, gather
+from timing import ServerTimingMiddleware, enabled_in_env, span
+import resumable_uploads
+from beer_batch import validate_batch, skipped_ids, finish_results, MAX_BATCH_SIZE
+from storage_cleanup import beer_object_paths, remove_objects
+from feed_events import FeedHub
+from response_cache import response_cache
 
 load_dotenv()
 
@@ -20,6 +37,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in per-request Server-Timing header and timing log line (SERVER_TIMING=1)
+if enabled_in_env():
+    app.add_middleware(ServerTimingMiddleware)
+
 # Supabase setup
 supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_ANON_KEY")
@@ -52,15 +73,16 @@ class BeerPost(BaseModel):
 async def register(user: UserCreate):
     try:
         # Create user account
-        response = supabase.auth.sign_up({
-            "email": user.email,
-            "password": user.password,
-            "options": {
-                "data": {
-                    "name": user.name
+        with span("sign-up"):
+            response = await run_sync(supabase.auth.sign_up, {
+                "email": user.email,
+                "password": user.password,
+                "options": {
+                    "data": {
+                        "name": user.name
+                    }
                 }
-            }
-        })
+            })
         
         if response.user:
             return {
@@ -76,10 +98,11 @@ async def register(user: UserCreate):
 @app.post("/api/login")
 async def login(user: UserLogin):
     try:
-        response = supabase.auth.sign_in_with_password({
-            "email": user.email,
-            "password": user.password
-        })
+        with span("sign-in"):
+            response = await run_sync(supabase.auth.sign_in_with_password, {
+                "email": user.email,
+                "password": user.password
+            })
         
         if response.session:
             return {
@@ -91,13 +114,50 @@ async def login(user: UserLogin):
     except Exception as e:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+class CurrentUser(BaseModel):
+    id: str
+    email: Optional[str] = None
+    token: Optional[str] = None
+
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
-        user = supabase.auth.get_user(credentials.credentials)
-        return user.user
+        # Verified locally against the JWT secret / cached JWKS, no call to Supabase Auth
+        with span("verify-jwt"):
+            claims = verify_jwt(credentials.credentials)
+        return CurrentUser(id=claims["sub"], email=claims.get("email"), token=credentials.credentials)
     except Exception as e:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def store_beer(user_id: str, note: str, variants):
+    """Upload every processed variant to Supabase storage and insert the beer row"""
+    bucket = supabase.storage.from_("beer-images")
+    folder = f"{user_id}/{uuid.uuid4()}"
+    # The variants are independent, so they upload concurrently
+    with span("storage-upload"):
+        await gather(*(
+            functools.partial(bucket.upload, f"{folder}/{variant}.{ext}", data, {"content-type": content_type})
+            for variant, ext, content_type, data in variants
+        ))
+    
+    # Get public URLs for the images
+    image_variants = variant_urls(
+        variants,
+        lambda variant, ext: bucket.get_public_url(f"{folder}/{variant}.{ext}")
+    )
+    
+    # Insert beer post
+    with span("insert"):
+        beer_response = await execute(supabase.table("beers").insert({
+            "user_id": user_id,
+            "image_url": image_variants["full"]["jpg"],
+            "image_variants": image_variants,
+            "note": note,
+            "created_at": datetime.now().isoformat()
+        }))
+    beers_changed()
+    
+    return {"message": "Beer posted successfully", "beer_id": beer_response.data[0]["id"]}
+
 @app.post("/api/beers")
 async def post_beer(
     note: str = Form(...),
@@ -105,84 +165,375 @@ async def post_beer(
     current_user = Depends(get_current_user)
 ):
     try:
-        # Upload image to Supabase storage
-        file_content = await image.read()
-        file_name = f"{current_user.id}_{datetime.now().isoformat()}_{image.filename}"
-        
-        storage_response = supabase.storage.from_("beer-images").upload(
-            file_name, file_content
+        # Normalize orientation, strip metadata and build the size ladder in the
+        # process pool, then upload every variant to Supabase storage
+        with span("read-upload"):
+            file_content = await image.read()
+        with span("image"):
+            variants = await process_upload(file_content)
+        return await store_beer(current_user.id, note, variants)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+class BeerBatch(BaseModel):
+    beers: list
+
+@app.post("/api/beers/batch")
+async def post_beer_batch(batch: BeerBatch, current_user = Depends(get_current_user)):
+    """Offline sync: up to MAX_BATCH_SIZE beers with client-generated ids, in one insert"""
+    if not 0 < len(batch.beers) <= MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"beers must hold 1 to {MAX_BATCH_SIZE} beers")
+    
+    # Invalid beers are reported on their own, the rest still go in
+    rows, results = validate_batch(batch.beers, current_user.id)
+    
+    inserted = []
+    owned = []
+    if rows:
+        try:
+            # One multi-row insert; ids that already exist (a retried sync) are skipped
+            with span("insert"):
+                response = await execute(supabase.table("beers").upsert(rows, ignore_duplicates=True))
+            inserted = response.data
+            
+            # A skipped id is only a retry if the existing beer is this user's
+            skipped = skipped_ids(rows, {beer["id"] for beer in inserted})
+            if skipped:
+                with span("select"):
+                    response = await execute(
+                        supabase.table("beers").select("id").in_("id", skipped).eq("user_id", current_user.id)
+                    )
+                owned = response.data
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if inserted:
+        beers_changed()
+    
+    inserted_ids = {beer["id"] for beer in inserted}
+    owned_ids = {beer["id"] for beer in owned}
+    return {"created": len(inserted_ids), "results": finish_results(results, inserted_ids, owned_ids)}
+
+class UploadCreate(BaseModel):
+    size: int
+
+# Resumable uploads: create a session, PUT the chunks (in any order, retrying
+# as needed), check which chunks arrived, then commit to post the beer
+@app.post("/api/uploads")
+async def create_upload(upload: UploadCreate, current_user = Depends(get_current_user)):
+    try:
+        # Also purges expired sessions from disk, so it runs off the event loop
+        session = await run_sync(resumable_uploads.create_session, current_user.id, upload.size)
+        return {**resumable_uploads.session_status(session), "max_size": resumable_uploads.MAX_UPLOAD_BYTES}
+    except resumable_uploads.UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+@app.get("/api/uploads/{upload_id}")
+async def get_upload(upload_id: str, current_user = Depends(get_current_user)):
+    try:
+        session = resumable_uploads.load_session(upload_id, current_user.id)
+        return resumable_uploads.session_status(session)
+    except resumable_uploads.UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+@app.put("/api/uploads/{upload_id}/chunks/{index}")
+async def put_upload_chunk(
+    upload_id: str,
+    index: int,
+    request: Request,
+    current_user = Depends(get_current_user)
+):
+    try:
+        session = resumable_uploads.load_session(upload_id, current_user.id)
+        content_length = request.headers.get("content-length")
+        if content_length is not None and not content_length.isdigit():
+            raise resumable_uploads.UploadError(400, "Invalid Content-Length")
+        # The body is streamed straight to disk, never buffered whole
+        return await resumable_uploads.write_chunk(
+            session,
+            index,
+            int(content_length) if content_length is not None else None,
+            request.stream()
         )
+    except resumable_uploads.UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+@app.post("/api/uploads/{upload_id}/commit")
+async def commit_upload(
+    upload_id: str,
+    note: str = Form(...),
+    current_user = Depends(get_current_user)
+):
+    try:
+        session = resumable_uploads.load_session(upload_id, current_user.id)
+        # Claiming the session keeps a concurrent commit from posting it twice
+        finished = session.get("result") or await run_sync(resumable_uploads.begin_commit, session)
+    except resumable_uploads.UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    if finished:
+        # Already posted: a retry of a commit whose response was lost
+        return finished
+    
+    try:
+        try:
+            # The pool worker decodes the assembled file from disk, so the original
+            # never has to be held in memory by this process
+            with span("image"):
+                assembled_path = await run_sync(resumable_uploads.assemble, session)
+                variants = await process_upload(assembled_path)
+        except resumable_uploads.UploadError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        except InvalidImageError as e:
+            # Resending the same bytes can't fix this, so drop the session
+            await run_sync(resumable_uploads.discard, session)
+            raise HTTPException(status_code=400, detail=str(e))
         
-        if storage_response.error:
-            raise HTTPException(status_code=400, detail="Image upload failed")
-        
-        # Get public URL for the image
-        image_url = supabase.storage.from_("beer-images").get_public_url(file_name)
+        try:
+            result = await store_beer(current_user.id, note, variants)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        await run_sync(resumable_uploads.complete, session, result)
+        return result
+    finally:
+        # complete() already dropped the claim; after a failure the client may retry
+        await run_sync(resumable_uploads.release_commit, session)
+
+@app.get("/api/beers/my")
+async def get_my_beers(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    current_user = Depends(get_current_user)
+):
+    try:
+        def beers_query():
+            return supabase.table("beers").select("*").eq("user_id", current_user.id)
         
-        # Insert beer post
-        beer_response = supabase.table("beers").insert({
-            "user_id": current_user.id,
-            "image_url": image_url.data.get("publicUrl"),
-            "note": note,
-            "created_at": datetime.now().isoformat()
-        }).execute()
+        # Passing limit and/or cursor switches to keyset pagination
+        if limit is not None or cursor is not None:
+            rows, next_cursor = await run_sync(fetch_page, beers_query(), parse_limit(limit), cursor)
+            return {"beers": rows, "next_cursor": next_cursor}
         
-        return {"message": "Beer posted successfully", "beer_id": beer_response.data[0]["id"]}
+        # Stream the full list page by page; the first page is fetched here so
+        # query errors still become a proper error response
+        pages = iter_pages(beers_query)
+        first_page = await run_sync(next, pages)
+        return StreamingResponse(
+            json_array_chunks(itertools.chain([first_page], pages)),
+            media_type="application/json"
+        )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.get("/api/beers/my")
-async def get_my_beers(current_user = Depends(get_current_user)):
+def add_user_name(rows):
+    """Format beers to include the user name"""
+    beers = []
+    for beer in rows:
+        beers.append({
+            **beer,
+            "user_name": beer["users"]["name"] if beer["users"] else "Unknown"
+        })
+    return beers
+
+def not_modified(request: Request, etag: Optional[str]):
+    """304 response when the client's cached copy is still current, else None"""
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL})
+    return None
+
+def cache_headers(etag: Optional[str]):
+    return {"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL} if etag else {}
+
+def feed_query():
+    """Beers with their poster's name, as the feed shows them"""
+    return supabase.table("beers").select("""
+        *,
+        users!beers_user_id_fkey(name)
+    """)
+
+async def fetch_feed_changes(since: Optional[str]):
+    """Beers inserted and deleted after a change cursor, shaped like the feed"""
+    changes = await run_sync(fetch_changes, supabase, since)
+    if changes["beers"]:
+        # Names come from the same embedded users relation as the feed
+        with span("select"):
+            rows = await execute(
+                feed_query().in_("id", [beer["id"] for beer in changes["beers"]])
+                .order("created_at", desc=True).order("id", desc=True)
+            )
+        changes["beers"] = add_user_name(rows.data)
+    return changes
+
+# One watcher per process fans feed changes out to every /api/beers/stream client
+feed_hub = FeedHub(fetch_feed_changes)
+
+def beers_changed():
+    """A write went through: drop cached feed responses and wake the live feed"""
+    response_cache.clear()
+    feed_hub.nudge()
+
+@app.get("/api/beers/stream")
+async def stream_beers():
+    """
+    Server-Sent Events: beer_inserted (the feed row), beer_deleted ({"id"}) and
+    resync (refetch the feed: this client fell too far behind and is being
+    disconnected, or the change log no longer reaches back to its position)
+    """
+    return StreamingResponse(
+        feed_hub.stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/beers/changes")
+async def get_beer_changes(since: Optional[str] = None):
+    """
+    Delta sync: beers inserted and ids deleted after the since cursor, plus the
+    cursor for next time. Without since only a cursor is returned; fetch the
+    feed after taking it and sync from there.
+    """
     try:
-        response = supabase.table("beers").select("*").eq("user_id", current_user.id).order("created_at", desc=True).execute()
-        return response.data
+        changes = await fetch_feed_changes(since)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    
+    if changes["expired"]:
+        raise HTTPException(status_code=410, detail="Cursor expired, fetch the feed again")
+    return {
+        "beers": changes["beers"],
+        "deleted": changes["deleted"],
+        "next_cursor": changes["next_cursor"],
+        "has_more": changes["has_more"]
+    }
 
 @app.get("/api/beers/all")
-async def get_all_beers():
+async def get_all_beers(
+    request: Request,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+):
+    # Passing limit and/or cursor switches to keyset pagination. Every caller
+    # gets the same page, so most are served from memory along with their ETag
+    if limit is not None or cursor is not None:
+        try:
+            page_limit = parse_limit(limit)
+            scope = f"{request.url.path}?limit={page_limit}&cursor={cursor or ''}"
+            
+            async def build_page():
+                rows, next_cursor = await run_sync(fetch_page, feed_query(), page_limit, cursor)
+                return json.dumps({"beers": add_user_name(rows), "next_cursor": next_cursor}).encode()
+            
+            etag, body = await response_cache.get(scope, lambda: run_sync(feed_etag, supabase, scope), build_page)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return not_modified(request, etag) or Response(body, media_type="application/json", headers=cache_headers(etag))
+    
+    # Cheap version check first: unchanged data needs neither the query nor a body
+    etag = await run_sync(feed_etag, supabase, f"{request.url.path}?{request.url.query}")
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
     try:
-        response = supabase.table("beers").select("""
-            *,
-            users!beers_user_id_fkey(name)
-        """).order("created_at", desc=True).execute()
-        
-        # Format the response to include user name
-        beers = []
-        for beer in response.data:
-            beers.append({
-                **beer,
-                "user_name": beer["users"]["name"] if beer["users"] else "Unknown"
-            })
-        
-        return beers
+        # Stream the full list page by page; the first page is fetched here so
+        # query errors still become a proper error response
+        pages = iter_pages(feed_query, key="all-beers")
+        first_page = await run_sync(next, pages)
+        return StreamingResponse(
+            json_array_chunks(itertools.chain([first_page], pages), add_user_name),
+            media_type="application/json",
+            headers=cache_headers(etag)
+        )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.delete("/api/beers/{beer_id}")
-async def delete_beer(beer_id: str, current_user = Depends(get_current_user)):
+async def delete_beer(beer_id: str, background_tasks: BackgroundTasks, current_user = Depends(get_current_user)):
     try:
-        # Verify the beer belongs to the current user
-        beer_response = supabase.table("beers").select("*").eq("id", beer_id).eq("user_id", current_user.id).execute()
-        
-        if not beer_response.data:
-            raise HTTPException(status_code=404, detail="Beer not found or not owned by user")
-        
-        # Delete the beer
-        supabase.table("beers").delete().eq("id", beer_id).execute()
-        
-        return {"message": "Beer deleted successfully"}
+        # Ownership check and delete in one statement; the deleted row comes
+        # back (DELETE ... RETURNING) with its photo URLs
+        with span("delete"):
+            deleted = await execute(supabase.table("beers").delete().eq("id", beer_id).eq("user_id", current_user.id))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    
+    if not deleted.data:
+        raise HTTPException(status_code=404, detail="Beer not found or not owned by user")
+    beers_changed()
+    
+    # The photos are removed after the response is sent, as the user so
+    # storage only lets them touch their own folder
+    background_tasks.add_task(remove_objects, current_user.token, beer_object_paths(deleted.data[0], current_user.id))
+    
+    return {"message": "Beer deleted successfully"}
+
+# Beers one bulk delete may remove (one id IN (...) statement)
+MAX_BULK_DELETE = 100
+
+class BulkDelete(BaseModel):
+    beer_ids: List[str]
+
+def parse_beer_id(value: str):
+    """Canonical (lowercase) beer id, or None when value isn't a UUID"""
+    try:
+        return str(uuid.UUID(value))
+    except ValueError:
+        return None
+
+@app.post("/api/beers/delete")
+async def delete_beers(bulk: BulkDelete, background_tasks: BackgroundTasks, current_user = Depends(get_current_user)):
+    if not 0 < len(bulk.beer_ids) <= MAX_BULK_DELETE:
+        raise HTTPException(status_code=400, detail=f"beer_ids must hold 1 to {MAX_BULK_DELETE} beer ids")
+    
+    # A malformed id would fail the whole IN (...) filter, so those are answered
+    # here and left out of the statement
+    parsed_ids = [parse_beer_id(beer_id) for beer_id in bulk.beer_ids]
+    valid_ids = list(dict.fromkeys(beer_id for beer_id in parsed_ids if beer_id))
+    
+    deleted = []
+    if valid_ids:
+        try:
+            # Ownership check and delete for every id in one statement
+            with span("delete"):
+                response = await execute(supabase.table("beers").delete().in_("id", valid_ids).eq("user_id", current_user.id))
+            deleted = response.data
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    if deleted:
+        beers_changed()
+    
+    # Every deleted beer's photos are removed together after the response
+    object_paths = [path for beer in deleted for path in beer_object_paths(beer, current_user.id)]
+    if object_paths:
+        background_tasks.add_task(remove_objects, current_user.token, object_paths)
+    
+    deleted_ids = {beer["id"] for beer in deleted}
+    return {
+        "deleted": len(deleted_ids),
+        "results": [
+            {
+                "beer_id": beer_id,
+                "status": "invalid_id" if parsed is None else "deleted" if parsed in deleted_ids else "not_found"
+            }
+            for beer_id, parsed in zip(bulk.beer_ids, parsed_ids)
+        ]
+    }
 
 @app.get("/api/leaderboard")
-async def get_leaderboard():
+async def get_leaderboard(request: Request):
+    async def build_leaderboard():
+        # Per-user daily running totals, built in Postgres in one round trip
+        with span("leaderboard"):
+            leaderboard = await execute(supabase.rpc("get_leaderboard", {}))
+        return json.dumps(leaderboard.data).encode()
+    
     try:
-        # Get beer counts by user and month
-        response = supabase.rpc("get_monthly_beer_counts").execute()
-        return response.data
+        # The same for every caller: served from memory, rebuilt only when the beers version moved
+        etag, body = await response_cache.get(
+            "leaderboard", lambda: run_sync(feed_etag, supabase, "leaderboard"), build_leaderboard
+        )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    return not_modified(request, etag) or Response(body, media_type="application/json", headers=cache_headers(etag))
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,136 @@
+import re
+import uuid
+import base64
+import json
+from datetime import datetime
+from timing import span
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Postgres trims trailing zeros off fractional seconds, but fromisoformat
+# before Python 3.11 only takes exactly 3 or 6 digits
+_FRACTION = re.compile(r'\.(\d{1,6})(?=[+-]|$)')
+
+
+def encode_cursor(beer):
+    """Build an opaque cursor pointing just after the given beer row"""
+    raw = json.dumps([beer["created_at"], beer["id"]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _parse_timestamp(value):
+    value = _FRACTION.sub(lambda match: '.' + match.group(1).ljust(6, '0'), value.replace('Z', '+00:00'), 1)
+    return datetime.fromisoformat(value)
+
+
+def decode_cursor_keys(cursor):
+    """
+    Returns: the (created_at, id) strings exactly as encode_cursor got them, or raises ValueError
+    Only for stores that compare the keys themselves (simple_main); anything
+    building a PostgREST filter must use decode_cursor.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, beer_id = json.loads(base64.urlsafe_b64decode(padded).decode('utf-8'))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(created_at, str) or not isinstance(beer_id, str):
+        raise ValueError("Invalid cursor")
+    return created_at, beer_id
+
+
+def decode_cursor(cursor):
+    """Returns: (created_at, id) of a Supabase beer row or raises ValueError"""
+    created_at, beer_id = decode_cursor_keys(cursor)
+
+    # Both end up inside a PostgREST filter string, so only well-formed values
+    # get through, re-serialized rather than passed on as sent
+    try:
+        created_at = _parse_timestamp(created_at).isoformat(timespec='microseconds')
+        beer_id = str(uuid.UUID(beer_id))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    return created_at, beer_id
+
+
+def parse_limit(value):
+    """Parse the limit query parameter, clamped to MAX_PAGE_SIZE"""
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def fetch_page(query, limit, cursor=None):
+    """
+    Run a beers select as one keyset page ordered by (created_at, id) descending
+    Seeks past the cursor instead of using OFFSET, so deep pages cost the same as the first.
+    Returns: (rows, next_cursor) where next_cursor is None on the last page
+    """
+    query = query.order("created_at", desc=True).order("id", desc=True)
+
+    if cursor:
+        created_at, beer_id = decode_cursor(cursor)
+        # The plain bound lets Postgres seek the (created_at, id) index to the
+        # cursor; the OR alone can only filter rows walked from the top
+        query = query.lte("created_at", created_at).or_(
+            f'created_at.lt."{created_at}",'
+            f'and(created_at.eq."{created_at}",id.lt.{beer_id})'
+        )
+
+    # Ask for one extra row to find out whether another page exists
+    with span('select'):
+        rows = query.limit(limit + 1).execute().data
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+def encode_change_cursor(xid, seq):
+    """Build an opaque cursor for a position in the beer change log"""
+    raw = json.dumps([xid, seq], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_change_cursor(cursor):
+    """Returns: (xid, seq) or raises ValueError"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        xid, seq = json.loads(base64.urlsafe_b64decode(padded).decode('utf-8'))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(xid, str) or not xid.isdigit() or not isinstance(seq, int):
+        raise ValueError("Invalid cursor")
+    return xid, seq
+
+
+def fetch_changes(supabase, since=None, limit=MAX_PAGE_SIZE):
+    """
+    Beers inserted and deleted after a change cursor (get_beer_changes, add-beer-changes.sql)
+    Without since nothing is returned but a cursor for now: take it, fetch the
+    feed, then sync from the cursor.
+    Returns: dict with beers (newest first), deleted ids, next_cursor,
+    has_more (call again right away) and expired (the feed must be refetched)
+    """
+    params = {'max_rows': limit}
+    if since:
+        params['since_xid'], params['since_seq'] = decode_change_cursor(since)
+
+    with span('changes'):
+        changes = supabase.rpc('get_beer_changes', params).execute().data
+    return {
+        "beers": changes["beers"],
+        "deleted": changes["deleted"],
+        "next_cursor": encode_change_cursor(changes["xid"], changes["seq"]),
+        "has_more": changes["has_more"],
+        "expired": changes["expired"]
+    }
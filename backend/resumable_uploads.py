@@ -0,0 +1,227 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import tempfile
+from async_db import run_sync
+
+# Sessions live on local disk so any worker on this host can take the next chunk
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or os.path.join(tempfile.gettempdir(), "beer-uploads")
+CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+SESSION_TTL_SECONDS = 24 * 60 * 60
+# A commit marker older than this was left by a worker that died mid-commit
+COMMIT_TIMEOUT_SECONDS = 10 * 60
+
+
+class UploadError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _session_dir(upload_id):
+    return os.path.join(UPLOAD_SPOOL_DIR, upload_id)
+
+
+def _commit_marker(session):
+    return os.path.join(_session_dir(session["upload_id"]), "commit.lock")
+
+
+def _remove_if_exists(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _chunk_path(session, index):
+    return os.path.join(_session_dir(session["upload_id"]), f"{index:06d}.part")
+
+
+def chunk_count(session):
+    return max(1, -(-session["size"] // session["chunk_size"]))
+
+
+def chunk_length(session, index):
+    """Exact byte length the chunk at index must have"""
+    if index < 0 or index >= chunk_count(session):
+        raise UploadError(400, f"Chunk index must be between 0 and {chunk_count(session) - 1}")
+    return min(session["chunk_size"], session["size"] - index * session["chunk_size"])
+
+
+def purge_expired_sessions():
+    """Drop abandoned sessions and old commit records; called whenever a new session is created"""
+    if not os.path.isdir(UPLOAD_SPOOL_DIR):
+        return
+    cutoff = time.time() - SESSION_TTL_SECONDS
+    for entry in os.scandir(UPLOAD_SPOOL_DIR):
+        if entry.is_dir() and entry.stat().st_mtime < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def create_session(user_id, size):
+    """Start an upload of size bytes; the cap is enforced before any data is sent"""
+    if size <= 0:
+        raise UploadError(400, "Upload size must be positive")
+    if size > MAX_UPLOAD_BYTES:
+        raise UploadError(413, f"Image must be {MAX_UPLOAD_BYTES // (1024 * 1024)} MB or less")
+
+    purge_expired_sessions()
+
+    session = {
+        "upload_id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "size": size,
+        "chunk_size": CHUNK_SIZE,
+        "created_at": time.time()
+    }
+    os.makedirs(_session_dir(session["upload_id"]))
+    with open(os.path.join(_session_dir(session["upload_id"]), "session.json"), "w") as f:
+        json.dump(session, f)
+    return session
+
+
+def load_session(upload_id, user_id):
+    try:
+        # Normalizes the id and rules out path tricks before touching the disk
+        upload_id = str(uuid.UUID(upload_id))
+        with open(os.path.join(_session_dir(upload_id), "session.json")) as f:
+            session = json.load(f)
+    except (ValueError, OSError):
+        raise UploadError(404, "Upload not found")
+
+    if session["user_id"] != user_id:
+        raise UploadError(404, "Upload not found")
+    return session
+
+
+def received_chunks(session):
+    return [index for index in range(chunk_count(session)) if os.path.exists(_chunk_path(session, index))]
+
+
+def session_status(session):
+    """What the client needs to resume: which chunks the server already has"""
+    result = session.get("result")
+    # Once committed the chunks are gone, but nothing is missing any more
+    received = list(range(chunk_count(session))) if result else received_chunks(session)
+    return {
+        "upload_id": session["upload_id"],
+        "size": session["size"],
+        "chunk_size": session["chunk_size"],
+        "chunk_count": chunk_count(session),
+        "received_chunks": received,
+        "missing_chunks": sorted(set(range(chunk_count(session))) - set(received)),
+        "beer_id": result["beer_id"] if result else None
+    }
+
+
+async def write_chunk(session, index, content_length, body):
+    """
+    Spool one chunk from the request body stream to disk
+    Rejects a wrong Content-Length up front and stops reading as soon as the
+    running byte count passes the chunk's length. Re-sending a chunk replaces it.
+    """
+    if "result" in session:
+        raise UploadError(409, "Upload already committed")
+    expected = chunk_length(session, index)
+    if content_length is not None and content_length != expected:
+        raise UploadError(413 if content_length > expected else 400, f"Chunk {index} must be exactly {expected} bytes")
+
+    final_path = _chunk_path(session, index)
+    partial_path = f"{final_path}.{uuid.uuid4().hex}.tmp"
+    received = 0
+    # File I/O runs on the worker pool, piece by piece, so the event loop never waits on the disk
+    try:
+        f = await run_sync(open, partial_path, "wb")
+        try:
+            async for piece in body:
+                received += len(piece)
+                if received > expected:
+                    raise UploadError(413, f"Chunk {index} must be exactly {expected} bytes")
+                await run_sync(f.write, piece)
+        finally:
+            await run_sync(f.close)
+
+        if received != expected:
+            raise UploadError(400, f"Chunk {index} is incomplete ({received} of {expected} bytes)")
+
+        # Atomic, so a retried chunk never leaves a half-written file behind
+        await run_sync(os.replace, partial_path, final_path)
+    finally:
+        await run_sync(_remove_if_exists, partial_path)
+
+    return await run_sync(session_status, session)
+
+
+def assemble(session):
+    """Stream the chunks, in order, into one spooled file and return its path"""
+    missing = session_status(session)["missing_chunks"]
+    if missing:
+        raise UploadError(409, f"Missing chunks: {missing}")
+
+    assembled_path = os.path.join(_session_dir(session["upload_id"]), "upload.bin")
+    with open(assembled_path, "wb") as out:
+        for index in range(chunk_count(session)):
+            with open(_chunk_path(session, index), "rb") as chunk:
+                shutil.copyfileobj(chunk, out)
+    return assembled_path
+
+
+def begin_commit(session):
+    """
+    Claim the session for one commit, or raise UploadError(409) while another runs
+    The marker file is created exclusively, so the claim holds across workers.
+    Returns: the stored result when a commit finished in the meantime, else None
+    """
+    marker = _commit_marker(session)
+    for attempt in range(2):
+        try:
+            os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileNotFoundError:
+            raise UploadError(404, "Upload not found")
+        except FileExistsError:
+            try:
+                stale = time.time() - os.path.getmtime(marker) > COMMIT_TIMEOUT_SECONDS
+            except OSError:
+                stale = True
+            if attempt or not stale:
+                raise UploadError(409, "Upload is already being committed")
+            _remove_if_exists(marker)
+
+    # A commit may have finished between loading the session and claiming it
+    with open(os.path.join(_session_dir(session["upload_id"]), "session.json")) as f:
+        result = json.load(f).get("result")
+    if result:
+        _remove_if_exists(marker)
+    return result
+
+
+def release_commit(session):
+    """Let the session be committed again (after a failed attempt)"""
+    _remove_if_exists(_commit_marker(session))
+
+
+def complete(session, result):
+    """
+    Record the commit's result and drop the spooled data
+    session.json stays until the session expires, so a commit retried after its
+    response was lost gets the same result back instead of a 404.
+    """
+    session_dir = _session_dir(session["upload_id"])
+    session_path = os.path.join(session_dir, "session.json")
+    partial_path = f"{session_path}.{uuid.uuid4().hex}.tmp"
+    with open(partial_path, "w") as f:
+        json.dump({**session, "result": result}, f)
+    os.replace(partial_path, session_path)
+
+    for entry in os.scandir(session_dir):
+        if entry.name != "session.json":
+            os.remove(entry.path)
+
+
+def discard(session):
+    shutil.rmtree(_session_dir(session["upload_id"]), ignore_errors=True)
@@ -1,14 +1,18 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 import os
 from datetime import datetime
-import json
-import urllib.request
-import urllib.parse
 import uuid
-import base64
+import asyncio
+import httpx
+from image_pipeline import process_upload, variant_urls, InvalidImageError
+from beer_store import BeerStore
+from beer_persistence import PersistentStore
+from pagination import encode_cursor, decode_cursor_keys, parse_limit
+from storage_client import StorageClient
+from timing import ServerTimingMiddleware, enabled_in_env
 
 app = FastAPI(title="Beer App API")
 
@@ -20,6 +24,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in per-request Server-Timing header and timing log line (SERVER_TIMING=1)
+if enabled_in_env():
+    app.add_middleware(ServerTimingMiddleware)
+
 # Supabase configuration
 SUPABASE_URL = os.environ.get('SUPABASE_URL')
 SUPABASE_ANON_KEY = os.environ.get('SUPABASE_ANON_KEY')
@@ -27,62 +35,60 @@ SUPABASE_ANON_KEY = os.environ.get('SUPABASE_ANON_KEY')
 if not SUPABASE_URL or not SUPABASE_ANON_KEY:
     raise ValueError("SUPABASE_URL and SUPABASE_ANON_KEY must be set")
 
-# Mock data storage (in production, this would be your database)
-users_db = {}
-beers_db = []
+# Mock data storage (in production, this would be your database). Set
+# SIMPLE_DATA_DIR to keep it on disk across restarts instead of memory only.
+SIMPLE_DATA_DIR = os.environ.get('SIMPLE_DATA_DIR')
+persistent_store = PersistentStore(SIMPLE_DATA_DIR) if SIMPLE_DATA_DIR else None
+store = persistent_store.store if persistent_store else BeerStore()
 current_user_id = None
 
-def upload_image_to_supabase(image_content, filename, user_id):
-    """Upload image to Supabase Storage and return public URL"""
+@app.on_event("shutdown")
+def close_store():
+    if persistent_store:
+        persistent_store.close()
+
+PLACEHOLDER_IMAGE_URL = "https://via.placeholder.com/300x300/4A90E2/FFFFFF?text=🍺"
+
+storage = StorageClient(SUPABASE_URL, SUPABASE_ANON_KEY, "beer-images")
+
+@app.on_event("shutdown")
+async def close_storage():
+    await storage.aclose()
+
+async def upload_image_to_supabase(variants, user_id):
+    """
+    Upload the processed size ladder to Supabase Storage, all variants at once
+    Returns: {"thumb": {"webp": url, "jpg": url}, ...} or None if the upload failed
+    """
+    folder = f"{user_id}/{uuid.uuid4()}"
+    paths = [f"{folder}/{variant}.{ext}" for variant, ext, _, _ in variants]
+    results = await asyncio.gather(
+        *(storage.upload(path, data, content_type) for path, (_, _, content_type, data) in zip(paths, variants)),
+        return_exceptions=True
+    )
+    
+    errors = [result for result in results if isinstance(result, Exception)]
+    if not errors:
+        return variant_urls(variants, lambda variant, ext: storage.public_url(f"{folder}/{variant}.{ext}"))
+    
+    for error in errors:
+        if isinstance(error, httpx.HTTPStatusError):
+            print(f"HTTP Error uploading image: {error.response.status_code} - {error.response.text}")
+            print(f"Upload URL: {error.request.url}")
+        else:
+            print(f"General error uploading image: {error}")
+            print(f"Error type: {type(error)}")
+    
+    # Don't leave the variants that did make it behind
+    await delete_images([path for path, result in zip(paths, results) if not isinstance(result, Exception)])
+    return None
+
+async def delete_images(object_paths):
+    """Best-effort removal of stored images; a failure only leaves an orphan"""
     try:
-        # Generate unique filename with proper extension
-        file_ext = filename.split('.')[-1] if '.' in filename else 'jpg'
-        unique_filename = f"{user_id}/{uuid.uuid4()}.{file_ext}"
-        
-        # Determine content type based on file extension
-        content_type = 'image/jpeg'  # Default
-        if file_ext.lower() in ['png']:
-            content_type = 'image/png'
-        elif file_ext.lower() in ['gif']:
-            content_type = 'image/gif'
-        elif file_ext.lower() in ['webp']:
-            content_type = 'image/webp'
-        
-        print(f"Attempting to upload image: {unique_filename}, size: {len(image_content)} bytes, type: {content_type}")
-        
-        # Upload to Supabase Storage
-        upload_req = urllib.request.Request(
-            f"{SUPABASE_URL}/storage/v1/object/beer-images/{unique_filename}",
-            data=image_content,
-            headers={
-                'Authorization': f'Bearer {SUPABASE_ANON_KEY}',
-                'Content-Type': content_type,
-                'apikey': SUPABASE_ANON_KEY
-            },
-            method='POST'
-        )
-        
-        with urllib.request.urlopen(upload_req) as upload_response:
-            upload_result = json.loads(upload_response.read().decode('utf-8'))
-            print(f"Upload successful: {upload_result}")
-        
-        # Get public URL
-        public_url = f"{SUPABASE_URL}/storage/v1/object/public/beer-images/{unique_filename}"
-        
-        return public_url
-        
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode('utf-8') if e.fp else str(e)
-        print(f"HTTP Error uploading image: {e.code} - {e.reason}")
-        print(f"Error response body: {error_body}")
-        print(f"Upload URL: {SUPABASE_URL}/storage/v1/object/beer-images/{unique_filename}")
-        # Return placeholder if upload fails
-        return "https://via.placeholder.com/300x300/4A90E2/FFFFFF?text=🍺"
+        await storage.delete(object_paths)
     except Exception as e:
-        print(f"General error uploading image: {e}")
-        print(f"Error type: {type(e)}")
-        # Return placeholder if upload fails
-        return "https://via.placeholder.com/300x300/4A90E2/FFFFFF?text=🍺"
+        print(f"Error deleting images {object_paths}: {e}")
 
 class UserCreate(BaseModel):
     username: str
@@ -96,23 +102,21 @@ class UserLogin(BaseModel):
 @app.post("/api/register")
 async def register(user: UserCreate):
     global current_user_id
-    user_id = f"user_{len(users_db) + 1}"
-    users_db[user_id] = {
-        "id": user_id,
-        "username": user.username,
-        "name": user.name,
-        "password": user.password  # In production, this should be hashed
-    }
+    try:
+        user_id = store.add_user(user.username, user.name, user.password)["id"]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await store.sync()
     current_user_id = user_id
     return {"message": "User registered successfully", "user_id": user_id, "access_token": f"token_{user_id}"}
 
 @app.post("/api/login")
 async def login(user: UserLogin):
     global current_user_id
-    for uid, u in users_db.items():
-        if u["username"] == user.username and u["password"] == user.password:
-            current_user_id = uid
-            return {"access_token": f"token_{uid}", "user_id": uid}
+    u = store.find_user(user.username)
+    if u and u["password"] == user.password:
+        current_user_id = u["id"]
+        return {"access_token": f"token_{u['id']}", "user_id": u["id"]}
     raise HTTPException(status_code=401, detail="Invalid credentials")
 
 @app.post("/api/beers")
@@ -129,47 +133,76 @@ async def post_beer(
     if len(note) > 250:
         raise HTTPException(status_code=400, detail="Note must be 250 characters or less")
     
-    # Read and upload image to Supabase Storage
+    # Resize and strip the image in the process pool, then upload the variants
     try:
         image_content = await image.read()
-        image_url = upload_image_to_supabase(image_content, image.filename or "image.jpg", current_user_id)
+        variants = await process_upload(image_content)
+    except InvalidImageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error processing image: {e}")
         raise HTTPException(status_code=500, detail="Failed to process image")
     
-    beer = {
-        "id": f"beer_{len(beers_db) + 1}",
+    # Use a placeholder if the upload fails
+    image_variants = await upload_image_to_supabase(variants, current_user_id)
+    image_url = image_variants["full"]["jpg"] if image_variants else PLACEHOLDER_IMAGE_URL
+    
+    beer = store.add_beer({
         "user_id": current_user_id,
         "image_url": image_url,
+        "image_variants": image_variants,
         "note": note.strip(),
         "created_at": datetime.now().isoformat(),
-        "user_name": users_db[current_user_id]["name"]
-    }
-    beers_db.append(beer)
+        "user_name": store.users[current_user_id]["name"]
+    })
+    await store.sync()
     
     return {"message": "Beer posted successfully", "beer_id": beer["id"], "image_url": image_url}
 
+def beers_page(limit: Optional[int], cursor: Optional[str], user_id: Optional[str] = None):
+    """One keyset page in the same shape as the Supabase-backed API"""
+    try:
+        rows, has_more = store.page(
+            parse_limit(limit),
+            # beer_N ids and the stored timestamps, compared as issued
+            decode_cursor_keys(cursor) if cursor else None,
+            user_id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"beers": rows, "next_cursor": encode_cursor(rows[-1]) if has_more else None}
+
 @app.get("/api/beers/my")
-async def get_my_beers():
+async def get_my_beers(limit: Optional[int] = None, cursor: Optional[str] = None):
     if not current_user_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    user_beers = [beer for beer in beers_db if beer["user_id"] == current_user_id]
-    return sorted(user_beers, key=lambda x: x["created_at"], reverse=True)
+    # Passing limit and/or cursor switches to keyset pagination
+    if limit is not None or cursor is not None:
+        return beers_page(limit, cursor, current_user_id)
+    return list(store.iter_beers(current_user_id))
 
 @app.get("/api/beers/all")
-async def get_all_beers():
-    return sorted(beers_db, key=lambda x: x["created_at"], reverse=True)
+async def get_all_beers(limit: Optional[int] = None, cursor: Optional[str] = None):
+    if limit is not None or cursor is not None:
+        return beers_page(limit, cursor)
+    return list(store.iter_beers())
 
 @app.delete("/api/beers/{beer_id}")
 async def delete_beer(beer_id: str):
     if not current_user_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    for i, beer in enumerate(beers_db):
-        if beer["id"] == beer_id and beer["user_id"] == current_user_id:
-            del beers_db[i]
-            return {"message": "Beer deleted successfully"}
+    beer = store.delete_beer(beer_id, current_user_id)
+    if beer:
+        await store.sync()
+        object_paths = [
+            storage.object_path(url)
+            for formats in (beer.get("image_variants") or {}).values()
+            for url in formats.values()
+        ]
+        await delete_images([path for path in object_paths if path])
+        return {"message": "Beer deleted successfully"}
     
     raise HTTPException(status_code=404, detail="Beer not found")
 
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent reads: while a call for a key is in flight,
+    other threads asking for the same key wait for it and share its result
+    (or its exception) instead of sending their own upstream request.
+    Results are shared, so callers must not mutate them.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        """Counters since start: upstream calls made and reads that joined one"""
+        with self._lock:
+            return {"leaders": self.leaders, "coalesced": self.coalesced}
+
+
+class AsyncSingleFlight:
+    """SingleFlight for the event loop: coroutines asking for an in-flight key await the same task"""
+
+    def __init__(self):
+        self._tasks = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        # Shielded so a caller that goes away doesn't cancel the call for the others
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {"leaders": self.leaders, "coalesced": self.coalesced}
+
+
+# Module level so every request of a process shares the in-flight calls: flights
+# for blocking Supabase calls in worker threads, async_flights on the event loop
+flights = SingleFlight()
+async_flights = AsyncSingleFlight()
+
+
+def stats():
+    """Coalescing counters of both, summed"""
+    thread_stats, loop_stats = flights.stats(), async_flights.stats()
+    return {name: thread_stats[name] + loop_stats[name] for name in thread_stats}
@@ -0,0 +1,81 @@
+import os
+import sys
+from dotenv import load_dotenv
+from supabase import create_client
+import httpx
+
+BUCKET = "beer-images"
+# Objects per storage delete request and per orphan query
+SWEEP_BATCH_SIZE = 100
+# Uploads younger than this may still be waiting for their beer row
+ORPHAN_MIN_AGE = "1 day"
+
+
+def _public_prefix():
+    return f"{os.getenv('SUPABASE_URL', '')}/storage/v1/object/public/{BUCKET}/"
+
+
+def beer_object_paths(beer, user_id):
+    """
+    Bucket paths of a beer's photo and its resized variants
+    Only objects in the user's own folder are returned: image_url comes from
+    the client, so it may point at a placeholder or someone else's photo.
+    """
+    urls = [beer.get("image_url")]
+    for formats in (beer.get("image_variants") or {}).values():
+        urls.extend(formats.values())
+
+    prefix = _public_prefix()
+    paths = []
+    for url in urls:
+        if not url or not url.startswith(prefix):
+            continue
+        path = url[len(prefix):].split("?", 1)[0]
+        if path.split("/", 1)[0] == user_id and path not in paths:
+            paths.append(path)
+    return paths
+
+
+def remove_objects(token, paths):
+    """Delete objects from the bucket as the token's user, a batch per request"""
+    supabase_url = os.getenv("SUPABASE_URL")
+    supabase_key = os.getenv("SUPABASE_ANON_KEY")
+    headers = {"apikey": supabase_key, "Authorization": f"Bearer {token}"}
+    with httpx.Client(base_url=f"{supabase_url}/storage/v1", headers=headers, timeout=30.0) as storage:
+        for start in range(0, len(paths), SWEEP_BATCH_SIZE):
+            response = storage.request("DELETE", f"/object/{BUCKET}", json={"prefixes": paths[start:start + SWEEP_BATCH_SIZE]})
+            response.raise_for_status()
+
+
+def sweep_orphans(service_key, max_batches=10):
+    """
+    Remove bucket objects no beer references (add-storage-sweeper.sql)
+    Needs the service role key: orphans belong to every user.
+    Returns: how many objects were removed
+    """
+    supabase = create_client(os.getenv("SUPABASE_URL"), service_key)
+    removed = 0
+    for _ in range(max_batches):
+        names = supabase.rpc("get_orphaned_beer_images", {
+            "min_age": ORPHAN_MIN_AGE,
+            "max_rows": SWEEP_BATCH_SIZE
+        }).execute().data or []
+        if not names:
+            break
+        remove_objects(service_key, names)
+        removed += len(names)
+        if len(names) < SWEEP_BATCH_SIZE:
+            break
+    return removed
+
+
+if __name__ == "__main__":
+    # Run from cron, e.g. daily: python storage_cleanup.py
+    load_dotenv()
+    service_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    if not service_key:
+        sys.exit("SUPABASE_SERVICE_ROLE_KEY must be set to sweep storage")
+    print(f"Removed {sweep_orphans(service_key)} orphaned objects")
+    # Same daily run trims the change log behind /api/beers/changes
+    pruned = create_client(os.getenv("SUPABASE_URL"), service_key).rpc("prune_beer_changes", {}).execute().data
+    print(f"Pruned {pruned} beer change log entries")
@@ -0,0 +1,90 @@
+import os
+import asyncio
+import httpx
+
+STORAGE_MAX_CONCURRENCY = int(os.getenv("STORAGE_MAX_CONCURRENCY", "8"))
+STORAGE_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+# Size of the pieces a file body is read and sent in
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class StorageClient:
+    """
+    Async client for one Supabase Storage bucket
+    Keeps a pool of keep-alive connections for the life of the process, and a
+    semaphore caps how many requests are in flight so a burst of uploads can't
+    take every connection or flood storage.
+    """
+
+    def __init__(self, supabase_url, api_key, bucket, max_concurrency=STORAGE_MAX_CONCURRENCY):
+        self.base_url = f"{supabase_url}/storage/v1"
+        self.api_key = api_key
+        self.bucket = bucket
+        self.max_concurrency = max_concurrency
+        self._client = None
+        self._semaphore = None
+
+    def _get_client(self):
+        # Created on first use so it belongs to the running event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers={"Authorization": f"Bearer {self.api_key}", "apikey": self.api_key},
+                timeout=STORAGE_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                )
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def _request(self, method, url, **kwargs):
+        client = self._get_client()
+        async with self._semaphore:
+            response = await client.request(method, url, **kwargs)
+        response.raise_for_status()
+        return response
+
+    async def upload(self, object_path, content, content_type):
+        """
+        Upload bytes, or stream a file from disk when given its path
+        Returns: the object's public URL
+        """
+        headers = {"Content-Type": content_type}
+        if isinstance(content, (bytes, bytearray)):
+            body = content
+        else:
+            headers["Content-Length"] = str(os.path.getsize(content))
+            body = _read_file(content)
+
+        await self._request("POST", f"{self.base_url}/object/{self.bucket}/{object_path}", content=body, headers=headers)
+        return self.public_url(object_path)
+
+    def public_url(self, object_path):
+        return f"{self.base_url}/object/public/{self.bucket}/{object_path}"
+
+    def object_path(self, public_url):
+        """Inverse of public_url; None for URLs outside this bucket (e.g. placeholders)"""
+        prefix = self.public_url("")
+        return public_url[len(prefix):] if public_url and public_url.startswith(prefix) else None
+
+    async def delete(self, object_paths):
+        """Remove several objects in one request"""
+        if not object_paths:
+            return
+        await self._request("DELETE", f"{self.base_url}/object/{self.bucket}", json={"prefixes": list(object_paths)})
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+async def _read_file(path):
+    # Reads are small and from local disk; the upload itself never holds the whole file
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
@@ -0,0 +1,40 @@
+import json
+from pagination import fetch_page
+from single_flight import flights
+
+# Rows fetched and serialized per chunk when streaming a whole list
+STREAM_BATCH_SIZE = 500
+
+
+def iter_pages(make_query, batch_size=STREAM_BATCH_SIZE, key=None):
+    """
+    Walk a beers select page by page with keyset pagination
+    make_query must return a fresh query builder for every page. With a key
+    naming the query, streams walking it at the same time share each page fetch.
+    """
+    cursor = None
+    while True:
+        if key is None:
+            rows, cursor = fetch_page(make_query(), batch_size, cursor)
+        else:
+            rows, cursor = flights.do(
+                (key, batch_size, cursor), lambda: fetch_page(make_query(), batch_size, cursor)
+            )
+        yield rows
+        if cursor is None:
+            return
+
+
+def json_array_chunks(pages, transform=None):
+    """Serialize pages of rows as one JSON array, yielding an encoded chunk per page"""
+    yield b'['
+    first = True
+    for rows in pages:
+        if transform:
+            rows = transform(rows)
+        if not rows:
+            continue
+        body = ','.join(json.dumps(row) for row in rows)
+        yield (body if first else ',' + body).encode()
+        first = False
+    yield b']'
@@ -0,0 +1,90 @@
+import os
+import json
+import time
+import contextvars
+from contextlib import contextmanager, nullcontext
+
+# Opt-in: SERVER_TIMING=1 installs ServerTimingMiddleware, which adds a
+# Server-Timing header and a log line per request. Without it no request has a
+# timer, and span() hands back one shared no-op context manager.
+def enabled_in_env():
+    return os.environ.get('SERVER_TIMING', '').lower() in ('1', 'true', 'yes')
+
+
+_current = contextvars.ContextVar('request_timer', default=None)
+_NO_SPAN = nullcontext()
+
+
+class RequestTimer:
+    """Named spans of one request, in the order they finished"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+
+    @contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append((name, (time.perf_counter() - started) * 1000))
+
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def header_value(self):
+        """Server-Timing value; spans still running when headers go out are left to the log line"""
+        parts = [f"{name};dur={duration:.1f}" for name, duration in self.spans]
+        parts.append(f"total;dur={self.total_ms():.1f}")
+        return ', '.join(parts)
+
+    def log(self, method, path, status):
+        print(json.dumps({
+            "event": "request_timing",
+            "method": method,
+            "path": path.split('?', 1)[0],
+            "status": status,
+            "total_ms": round(self.total_ms(), 2),
+            "spans": [[name, round(duration, 2)] for name, duration in self.spans]
+        }))
+
+
+def span(name):
+    """Time a block as part of the current request (no-op when timing is off)"""
+    timer = _current.get()
+    return timer.span(name) if timer is not None else _NO_SPAN
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware that times each HTTP request (only installed when enabled)
+    The Server-Timing header is added to the response start; the log line is
+    written once the body (including a streamed one) has been sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        
+        timer = RequestTimer()
+        _current.set(timer)
+        status = None
+        
+        async def send_with_timing(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                headers = list(message.get('headers', []))
+                headers.append((b'server-timing', timer.header_value().encode('latin-1')))
+                message = {**message, 'headers': headers}
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            timer.log(scope['method'], scope['path'], status)
@@ -0,0 +1,134 @@
+"""
+Measure request throughput of backend/main.py on one event loop, with Supabase
+calls run inline (blocking the loop, as before async_db) versus offloaded
+
+Every Supabase call is faked with a fixed network latency so only the
+concurrency of the app itself is measured. The response cache is bypassed.
+
+Usage: python benchmarks/backend_concurrency.py [--latency-ms 20] [--requests 200] [--concurrency 1 10 50]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_ANON_KEY", "benchmark")
+
+import httpx
+import main
+
+ENDPOINTS = ["/api/beers/all?limit=50", "/api/beers/my?limit=50", "/api/leaderboard"]
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    """Chainable stand-in for a postgrest query builder; execute() blocks like a round trip"""
+
+    def __init__(self, latency, data):
+        self.latency = latency
+        self.data = data
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        time.sleep(self.latency)
+        return FakeResponse(self.data)
+
+
+class FakeSupabase:
+    def __init__(self, latency):
+        self.latency = latency
+        self.beers = [
+            {"id": str(index), "user_id": "u1", "note": "cheers", "created_at": f"2024-01-01T00:00:{index:02d}",
+             "image_url": "", "users": {"name": "Drinker"}}
+            for index in range(50)
+        ]
+
+    def table(self, name):
+        return FakeQuery(self.latency, self.beers)
+
+    def rpc(self, name, params=None):
+        # No feed version RPC, so requests always take the full path
+        if name == "get_beer_feed_version":
+            return FakeQuery(self.latency, None)
+        return FakeQuery(self.latency, [])
+
+
+class UncachedResponses:
+    """Stand-in for the response cache, so every request goes through the (faked) database calls"""
+
+    async def get(self, key, etag_fn, build_fn):
+        return await etag_fn(), await build_fn()
+
+    def clear(self):
+        pass
+
+
+async def inline_run_sync(fn, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+async def inline_execute(query):
+    return query.execute()
+
+
+async def inline_gather(*calls):
+    return [call() for call in calls]
+
+
+def set_mode(offloaded):
+    if offloaded:
+        import async_db
+        main.run_sync, main.execute, main.gather = async_db.run_sync, async_db.execute, async_db.gather
+    else:
+        main.run_sync, main.execute, main.gather = inline_run_sync, inline_execute, inline_gather
+
+
+async def drive(path, total, concurrency):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        queue = iter(range(total))
+
+        async def worker():
+            for _ in queue:
+                response = await client.get(path)
+                if response.status_code != 200:
+                    raise SystemExit(f"{path} returned {response.status_code}: {response.text}")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - started)
+
+
+def main_benchmark(latency_ms, total, concurrencies):
+    main.supabase = FakeSupabase(latency_ms / 1000)
+    # Cached responses would skip the calls whose offloading is measured here
+    main.response_cache = UncachedResponses()
+    main.app.dependency_overrides[main.get_current_user] = lambda: main.CurrentUser(id="u1")
+
+    print(f"Fake Supabase latency: {latency_ms} ms, {total} requests per run")
+    print(f"{'endpoint':<26} {'concurrency':>11} {'inline (req/s)':>15} {'offloaded (req/s)':>18} {'speedup':>8}")
+    for path in ENDPOINTS:
+        for concurrency in concurrencies:
+            set_mode(False)
+            inline = asyncio.run(drive(path, total, concurrency))
+            set_mode(True)
+            offloaded = asyncio.run(drive(path, total, concurrency))
+            print(f"{path:<26} {concurrency:>11} {inline:>15.1f} {offloaded:>18.1f} {offloaded / inline:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    args = parser.parse_args()
+    main_benchmark(args.latency_ms, args.requests, args.concurrency)
@@ -0,0 +1,624 @@
+"""
+In-process stand-in for the parts of Supabase the API talks to over HTTP
+
+Implements just what api/*.py and backend/main.py use:
+- PostgREST: select with eq/neq/lt/lte/gt/gte/in filters, or=(...) groups,
+  order, limit and embedded users(name); insert; delete; the RPCs the API calls
+- Auth: password sign up, sign in and refresh with HS256 access tokens
+- Storage: object upload, public download and bulk delete
+
+Every request waits latency seconds (plus optional jitter) before it is answered
+so the API sees a network round trip.
+
+Usage: python benchmarks/fake_supabase.py [--port 54321] [--beers 1000] [--latency-ms 10]
+"""
+import re
+import sys
+import json
+import time
+import uuid
+import bisect
+import random
+import argparse
+import threading
+import urllib.parse
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import jwt
+
+JWT_SECRET = "fake-supabase-jwt-secret-for-benchmarks-only"
+# supabase-py only accepts keys shaped like a JWT
+ANON_KEY = jwt.encode({"iss": "supabase", "role": "anon"}, JWT_SECRET, algorithm="HS256")
+TOKEN_LIFETIME = 3600
+DEFAULT_PASSWORD = "password"
+
+FILTER_OPERATORS = {
+    "eq": lambda value, target: value == target,
+    "neq": lambda value, target: value != target,
+    "lt": lambda value, target: value is not None and value < target,
+    "lte": lambda value, target: value is not None and value <= target,
+    "gt": lambda value, target: value is not None and value > target,
+    "gte": lambda value, target: value is not None and value >= target,
+    "in": lambda value, target: value in target,
+}
+
+
+def timestamp(moment):
+    return moment.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+def split_top_level(text):
+    """Split on commas outside quotes and parentheses"""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    if current:
+        parts.append("".join(current))
+    return parts
+
+
+def unquote(value):
+    return value[1:-1] if len(value) >= 2 and value[0] == value[-1] == '"' else value
+
+
+def parse_condition(text):
+    """'col.op.value', 'and(...)' or 'or(...)' -> a predicate tree"""
+    for group in ("and", "or"):
+        if text.startswith(f"{group}(") and text.endswith(")"):
+            return (group, [parse_condition(part) for part in split_top_level(text[len(group) + 1:-1])])
+    column, operator, value = text.split(".", 2)
+    return ("cmp", column, operator, value)
+
+
+def parse_filter(column, expression):
+    operator, value = expression.split(".", 1)
+    return ("cmp", column, operator, value)
+
+
+def matches(row, condition):
+    kind = condition[0]
+    if kind == "and":
+        return all(matches(row, part) for part in condition[1])
+    if kind == "or":
+        return any(matches(row, part) for part in condition[1])
+
+    _, column, operator, value = condition
+    if operator == "in":
+        target = {unquote(item) for item in split_top_level(value.strip("()"))}
+    elif operator == "is":
+        return row.get(column) is None if value == "null" else row.get(column) == (value == "true")
+    else:
+        target = unquote(value)
+    value = row.get(column)
+    return FILTER_OPERATORS[operator](None if value is None else str(value), target)
+
+
+def keyset_bound(condition):
+    """
+    The (created_at, id) upper bound of the keyset filter pagination.fetch_page
+    builds, so a page can start with a bisect instead of a scan
+    """
+    if condition[0] != "or" or len(condition[1]) != 2:
+        return None
+    first, second = condition[1]
+    if first[0] != "cmp" or first[1:3] != ("created_at", "lt") or second[0] != "and":
+        return None
+    parts = second[1]
+    if len(parts) != 2 or parts[1][0] != "cmp" or parts[1][1:3] != ("id", "lt"):
+        return None
+    return (unquote(first[3]), unquote(parts[1][3]))
+
+
+class FakeDatabase:
+    """Beers and users in memory, indexed by (created_at, id) for everyone and per user"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.users = {}
+        self.users_by_email = {}
+        self.refresh_tokens = {}
+        self.beers = {}
+        self.timeline = []
+        self.user_timelines = defaultdict(list)
+        self.daily_counts = defaultdict(int)
+        self.row_count = 0
+        self.deletion_generation = 0
+        self.changes = []
+        self.objects = {}
+
+    def add_user(self, email, name, password=DEFAULT_PASSWORD, user_id=None):
+        with self.lock:
+            user = {
+                "id": user_id or str(uuid.uuid4()),
+                "aud": "authenticated",
+                "role": "authenticated",
+                "email": email,
+                "app_metadata": {"provider": "email"},
+                "user_metadata": {"name": name},
+                "created_at": timestamp(datetime.now(timezone.utc)),
+                "password": password
+            }
+            self.users[user["id"]] = user
+            self.users_by_email[email] = user
+            return user
+
+    def add_beer(self, values):
+        with self.lock:
+            beer = {
+                "id": str(uuid.uuid4()),
+                "image_url": "",
+                "image_variants": None,
+                "note": "",
+                "created_at": timestamp(datetime.now(timezone.utc)),
+                **values
+            }
+            key = (beer["created_at"], beer["id"])
+            self.beers[beer["id"]] = beer
+            bisect.insort(self.timeline, key)
+            bisect.insort(self.user_timelines[beer["user_id"]], key)
+            self.daily_counts[(beer["user_id"], beer["created_at"][:10])] += 1
+            self.row_count += 1
+            self.changes.append(beer["id"])
+            return beer
+
+    def delete_beer(self, beer_id):
+        with self.lock:
+            beer = self.beers.pop(beer_id)
+            key = (beer["created_at"], beer["id"])
+            for keys in (self.timeline, self.user_timelines[beer["user_id"]]):
+                del keys[bisect.bisect_left(keys, key)]
+            day = (beer["user_id"], beer["created_at"][:10])
+            self.daily_counts[day] -= 1
+            if not self.daily_counts[day]:
+                del self.daily_counts[day]
+            self.row_count -= 1
+            self.deletion_generation += 1
+            self.changes.append(beer_id)
+            return beer
+
+    def seed(self, beers, users=20, days=90, seed=42):
+        """Add users (user0@example.com, ...) and beers spread over the last days"""
+        rng = random.Random(seed)
+        created = [
+            self.users_by_email.get(f"user{index}@example.com") or self.add_user(f"user{index}@example.com", f"Drinker {index}")
+            for index in range(users)
+        ]
+        now = datetime.now(timezone.utc)
+        for _ in range(beers):
+            self.add_beer({
+                "user_id": rng.choice(created)["id"],
+                "note": "Seeded beer",
+                "image_url": "https://example.com/beer.jpg",
+                "created_at": timestamp(now - timedelta(seconds=rng.randrange(days * 86400)))
+            })
+        return created
+
+    def select_beers(self, filters, order, limit):
+        """Rows matching filters, walking an index in (created_at, id) order where possible"""
+        with self.lock:
+            user_filter = next((f for f in filters if f[0] == "cmp" and f[1:3] == ("user_id", "eq")), None)
+            keys = self.user_timelines.get(unquote(user_filter[3]), []) if user_filter else self.timeline
+            descending = order and order[0] == ("created_at", True)
+
+            if descending:
+                bound = next((keyset_bound(f) for f in filters if keyset_bound(f)), None)
+                end = bisect.bisect_left(keys, bound) if bound else len(keys)
+                candidates = (keys[index] for index in range(end - 1, -1, -1))
+            else:
+                candidates = iter(keys)
+
+            rows = []
+            for _, beer_id in candidates:
+                beer = self.beers[beer_id]
+                if all(matches(beer, f) for f in filters):
+                    rows.append(beer)
+                    if descending and limit is not None and len(rows) >= limit:
+                        break
+
+        if order and not descending:
+            for column, desc in reversed(order):
+                rows.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+        return rows[:limit] if limit is not None else rows
+
+    def user_name(self, user_id):
+        user = self.users.get(user_id)
+        return user["user_metadata"].get("name") if user else None
+
+    def feed_version(self):
+        with self.lock:
+            return {
+                "row_count": self.row_count,
+                "deletion_generation": self.deletion_generation,
+                "max_created_at": self.timeline[-1][0] if self.timeline else None
+            }
+
+    def changes_since(self, since_xid, since_seq, max_rows):
+        """What get_beer_changes() in add-beer-changes.sql returns; every change is its own transaction"""
+        with self.lock:
+            horizon = len(self.changes) + 1
+            if since_xid is None:
+                return {"beers": [], "deleted": [], "xid": str(horizon), "seq": 0, "has_more": False, "expired": False}
+            since = (int(since_xid), since_seq)
+            page = [(seq, beer_id) for seq, beer_id in enumerate(self.changes, 1) if (seq, seq) > since][:max_rows + 1]
+            has_more = len(page) > max_rows
+            page = page[:max_rows]
+            next_position = (page[-1][0], page[-1][0]) if has_more else max(since, (horizon, 0))
+            changed = list(dict.fromkeys(beer_id for _, beer_id in page))
+            beers = [self.beers[beer_id] for beer_id in changed if beer_id in self.beers]
+            beers.sort(key=lambda beer: (beer["created_at"], beer["id"]), reverse=True)
+            return {
+                "beers": beers,
+                "deleted": [beer_id for beer_id in changed if beer_id not in self.beers],
+                "xid": str(next_position[0]),
+                "seq": next_position[1],
+                "has_more": has_more,
+                "expired": False
+            }
+
+    def daily_count_rows(self):
+        with self.lock:
+            return [
+                {"user_id": user_id, "day": day, "count": count}
+                for (user_id, day), count in self.daily_counts.items()
+            ]
+
+    def leaderboard(self):
+        """What get_leaderboard() in add-leaderboard-rpc.sql returns"""
+        with self.lock:
+            daily = defaultdict(int)
+            for (user_id, day), count in self.daily_counts.items():
+                name = self.user_name(user_id) or f"User {user_id[:8]}..."
+                daily[(name, day)] += count
+        per_user = defaultdict(list)
+        for (name, day), count in sorted(daily.items()):
+            total = per_user[name][-1]["total_drinks"] + count if per_user[name] else count
+            per_user[name].append({"month": day, "total_drinks": total})
+        ranking = sorted(per_user.items(), key=lambda item: (-item[1][-1]["total_drinks"], item[1][0]["month"], item[0]))
+        return [{"user_name": name, "monthly_data": monthly_data} for name, monthly_data in ranking]
+
+    def orphaned_images(self, max_rows):
+        """Unreferenced beer-images objects, like add-storage-sweeper.sql (without its min_age)"""
+        with self.lock:
+            referenced = set()
+            for beer in self.beers.values():
+                urls = [beer.get("image_url")]
+                for formats in (beer.get("image_variants") or {}).values():
+                    urls.extend(formats.values())
+                referenced.update(url.split("/object/public/", 1)[1].split("?", 1)[0] for url in urls if url and "/object/public/" in url)
+            return [key.split("/", 1)[1] for key in self.objects if key.startswith("beer-images/") and key not in referenced][:max_rows]
+
+    def monthly_counts(self):
+        with self.lock:
+            totals = defaultdict(int)
+            for (user_id, day), count in self.daily_counts.items():
+                totals[(user_id, day[:7])] += count
+            return [
+                {"user_id": user_id, "user_name": self.user_name(user_id), "month": month, "total_drinks": count}
+                for (user_id, month), count in sorted(totals.items())
+            ]
+
+
+def project(row, select, db):
+    """Apply a PostgREST select list, including an embedded users(name)"""
+    columns = [part.strip() for part in split_top_level(select or "*")]
+    result = {}
+    for column in columns:
+        embedded = re.match(r"^(\w+)(?:!\w+)?\((.*)\)$", column)
+        if column == "*":
+            result.update(row)
+        elif embedded and embedded.group(1) == "users":
+            name = db.user_name(row.get("user_id"))
+            result["users"] = {"name": name} if name is not None else None
+        else:
+            result[column] = row.get(column)
+    return result
+
+
+class FakeSupabase:
+    """Configuration and state shared by every request handler thread"""
+
+    def __init__(self, latency=0.0, jitter=0.0):
+        self.db = FakeDatabase()
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = defaultdict(int)
+        self.rpcs = {
+            "get_user_names": lambda params: {
+                user_id: self.db.user_name(user_id)
+                for user_id in params.get("user_ids", []) if self.db.user_name(user_id) is not None
+            },
+            "get_beer_feed_version": lambda params: self.db.feed_version(),
+            "get_monthly_beer_counts": lambda params: self.db.monthly_counts(),
+            "get_leaderboard": lambda params: self.db.leaderboard(),
+            "get_orphaned_beer_images": lambda params: self.db.orphaned_images(params.get("max_rows", 100)),
+            "get_beer_changes": lambda params: self.db.changes_since(
+                params.get("since_xid"), params.get("since_seq", 0), params.get("max_rows", 200)
+            ),
+            "prune_beer_changes": lambda params: 0,
+        }
+
+    def issue_session(self, user):
+        now = int(time.time())
+        access_token = jwt.encode({
+            "sub": user["id"],
+            "aud": "authenticated",
+            "role": "authenticated",
+            "email": user["email"],
+            "user_metadata": user["user_metadata"],
+            "iat": now,
+            "exp": now + TOKEN_LIFETIME
+        }, JWT_SECRET, algorithm="HS256")
+        refresh_token = uuid.uuid4().hex
+        self.db.refresh_tokens[refresh_token] = user["id"]
+        public_user = {key: value for key, value in user.items() if key != "password"}
+        return {
+            "access_token": access_token,
+            "token_type": "bearer",
+            "expires_in": TOKEN_LIFETIME,
+            "expires_at": now + TOKEN_LIFETIME,
+            "refresh_token": refresh_token,
+            "user": public_user
+        }
+
+    def user_for_token(self, authorization):
+        token = (authorization or "").replace("Bearer ", "", 1)
+        try:
+            claims = jwt.decode(token, JWT_SECRET, algorithms=["HS256"], audience="authenticated")
+        except jwt.PyJWTError:
+            return None
+        return self.db.users.get(claims["sub"])
+
+
+class FakeSupabaseHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeSupabase/1.0"
+    # Headers and body go out in separate writes; with Nagle on, each response
+    # would wait out the client's delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def fake(self):
+        return self.server.fake
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        # Read once, up front: even GETs may carry a body that must be drained
+        # before the next request on a keep-alive connection
+        if not hasattr(self, "_body"):
+            length = int(self.headers.get("Content-Length") or 0)
+            self._body = self.rfile.read(length) if length else b""
+        return self._body
+
+    def read_json(self):
+        body = self.read_body()
+        return json.loads(body) if body else {}
+
+    def handle_request(self, method):
+        fake = self.fake
+        if hasattr(self, "_body"):
+            del self._body
+        self.read_body()
+        if fake.latency or fake.jitter:
+            time.sleep(fake.latency + random.uniform(0, fake.jitter))
+
+        parsed = urllib.parse.urlparse(self.path)
+        path = parsed.path
+        params = urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)
+        area = path.split("/")[1] if path.count("/") > 1 else ""
+        fake.requests[f"{method} /{area}"] += 1
+
+        try:
+            if path.startswith("/rest/v1/rpc/"):
+                return self.rpc(path[len("/rest/v1/rpc/"):])
+            if path.startswith("/rest/v1/"):
+                return self.table(method, path[len("/rest/v1/"):], params)
+            if path.startswith("/auth/v1/"):
+                return self.auth(method, path[len("/auth/v1/"):], dict(params))
+            if path.startswith("/storage/v1/"):
+                return self.storage(method, path[len("/storage/v1/"):])
+        except Exception as e:
+            return self.send_json(500, {"code": "XX000", "message": f"Fake Supabase error: {e}"})
+        self.send_json(404, {"message": f"No route for {method} {path}"})
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def do_PATCH(self):
+        self.handle_request("PATCH")
+
+    def do_DELETE(self):
+        self.handle_request("DELETE")
+
+    def rpc(self, name):
+        params = self.read_json()
+        function = self.fake.rpcs.get(name)
+        if function is None:
+            return self.send_json(404, {
+                "code": "PGRST202",
+                "message": f"Could not find the function public.{name} in the schema cache"
+            })
+        self.send_json(200, function(params))
+
+    def table(self, method, name, params):
+        db = self.fake.db
+        if name == "beer_daily_counts" and method == "GET":
+            rows = db.daily_count_rows()
+            rows.sort(key=lambda row: row["day"])
+            return self.send_json(200, rows)
+        if name != "beers":
+            return self.send_json(404, {"code": "42P01", "message": f'relation "public.{name}" does not exist'})
+
+        select, order, limit, filters = None, [], None, []
+        for key, value in params:
+            if key == "select":
+                select = value
+            elif key == "order":
+                order = [(part.split(".")[0], part.split(".")[1:2] == ["desc"]) for part in value.split(",")]
+            elif key == "limit":
+                limit = int(value)
+            elif key == "or":
+                filters.append(parse_condition(f"or{value}"))
+            elif key not in ("offset", "columns"):
+                filters.append(parse_filter(key, value))
+
+        if method == "GET":
+            rows = db.select_beers(filters, order, limit)
+            return self.send_json(200, [project(row, select, db) for row in rows])
+
+        if method == "POST":
+            values = self.read_json()
+            ignore_duplicates = "resolution=ignore-duplicates" in self.headers.get("Prefer", "")
+            with db.lock:
+                rows = values if isinstance(values, list) else [values]
+                duplicates = [row for row in rows if row.get("id") in db.beers]
+                if duplicates and not ignore_duplicates:
+                    return self.send_json(409, {
+                        "code": "23505",
+                        "message": 'duplicate key value violates unique constraint "beers_pkey"'
+                    })
+                inserted = [db.add_beer(row) for row in rows if row.get("id") not in db.beers]
+            return self.send_json(201, inserted)
+
+        if method == "DELETE":
+            with db.lock:
+                doomed = db.select_beers(filters, [], None)
+                deleted = [db.delete_beer(row["id"]) for row in doomed]
+            return self.send_json(200, [project(row, select, db) for row in deleted])
+
+        self.send_json(405, {"message": f"{method} not supported on {name}"})
+
+    def auth(self, method, route, params):
+        fake = self.fake
+        db = fake.db
+        if route == ".well-known/jwks.json":
+            return self.send_json(200, {"keys": []})
+
+        if route == "signup" and method == "POST":
+            data = self.read_json()
+            if data.get("email") in db.users_by_email:
+                return self.send_json(422, {"code": 422, "msg": "User already registered"})
+            name = (data.get("data") or {}).get("name", "")
+            user = db.add_user(data["email"], name, data.get("password", ""))
+            return self.send_json(200, fake.issue_session(user))
+
+        if route == "token" and method == "POST":
+            data = self.read_json()
+            if params.get("grant_type") == "password":
+                user = db.users_by_email.get(data.get("email"))
+                if not user or user["password"] != data.get("password"):
+                    return self.send_json(400, {"error": "invalid_grant", "error_description": "Invalid login credentials"})
+                return self.send_json(200, fake.issue_session(user))
+            if params.get("grant_type") == "refresh_token":
+                user_id = db.refresh_tokens.pop(data.get("refresh_token"), None)
+                if user_id is None:
+                    return self.send_json(400, {"error": "invalid_grant", "error_description": "Invalid Refresh Token"})
+                return self.send_json(200, fake.issue_session(db.users[user_id]))
+
+        if route == "user" and method == "GET":
+            user = fake.user_for_token(self.headers.get("Authorization"))
+            if user is None:
+                return self.send_json(401, {"code": 401, "msg": "invalid JWT"})
+            return self.send_json(200, {key: value for key, value in user.items() if key != "password"})
+
+        if route == "logout":
+            return self.send_json(204, {})
+
+        self.send_json(404, {"message": f"No auth route {route}"})
+
+    def storage(self, method, route):
+        objects = self.fake.db.objects
+        if route.startswith("object/public/") and method == "GET":
+            content = objects.get(route[len("object/public/"):])
+            if content is None:
+                return self.send_json(404, {"message": "Object not found"})
+            self.send_response(200)
+            self.send_header("Content-Type", content[0])
+            self.send_header("Content-Length", str(len(content[1])))
+            self.end_headers()
+            self.wfile.write(content[1])
+            return
+
+        if route.startswith("object/") and method == "POST":
+            key = route[len("object/"):]
+            objects[key] = (self.headers.get("Content-Type", "application/octet-stream"), self.read_body())
+            return self.send_json(200, {"Key": key, "Id": str(uuid.uuid4())})
+
+        if route.startswith("object/") and method == "DELETE":
+            bucket = route[len("object/"):]
+            removed = [
+                {"name": name} for name in self.read_json().get("prefixes", [])
+                if objects.pop(f"{bucket}/{name}", None) is not None
+            ]
+            return self.send_json(200, removed)
+
+        self.send_json(404, {"message": f"No storage route {route}"})
+
+
+class FakeSupabaseServer(ThreadingHTTPServer):
+    # The default backlog of 5 drops connections under load (and clients retry after 1s)
+    request_queue_size = 256
+    daemon_threads = True
+
+
+def start(port=0, latency=0.0, jitter=0.0):
+    """
+    Run a fake on a background thread
+    Returns: (server, fake); server.server_address has the bound port
+    """
+    server = FakeSupabaseServer(("127.0.0.1", port), FakeSupabaseHandler)
+    server.fake = FakeSupabase(latency, jitter)
+    threading.Thread(target=server.serve_forever, name="fake-supabase", daemon=True).start()
+    return server, server.fake
+
+
+def environment(server):
+    """Environment variables that point the API at the fake"""
+    return {
+        "SUPABASE_URL": f"http://127.0.0.1:{server.server_address[1]}",
+        "SUPABASE_ANON_KEY": ANON_KEY,
+        "SUPABASE_JWT_SECRET": JWT_SECRET,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--beers", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=10)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    server, fake = start(args.port, args.latency_ms / 1000, args.jitter_ms / 1000)
+    fake.db.seed(args.beers, args.users)
+    for name, value in environment(server).items():
+        print(f"export {name}={value}")
+    print(f"Seeded {args.beers} beers for {args.users} users (password: {DEFAULT_PASSWORD})", file=sys.stderr)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,346 @@
+"""
+Load-test the API endpoints against the local fake Supabase
+
+For each data size the fake is reseeded, then every endpoint is driven at each
+concurrency level. Throughput and p50/p95/p99 latency are printed and saved as
+JSON (tagged with the git commit) so runs can be compared across commits, along
+with the upstream (fake Supabase) requests made and the reads that were
+coalesced onto another request's in-flight call.
+
+Targets:
+- api: the Vercel handlers in api/, each served on its own port like a function
+- backend: the FastAPI app in backend/main.py under uvicorn
+
+Usage:
+  python benchmarks/load_test.py [--target api|backend] [--beers 1000 10000]
+      [--concurrency 1 8 32] [--requests 200] [--latency-ms 10]
+      [--endpoints all-beers leaderboard ...] [--full-lists]
+      [--output results.json] [--compare baseline.json]
+"""
+import os
+import sys
+import io
+import json
+import time
+import uuid
+import queue
+import socket
+import argparse
+import platform
+import threading
+import subprocess
+import http.client
+import importlib.util
+from datetime import datetime, timezone
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.append(BENCHMARKS_DIR)
+import fake_supabase
+
+ENDPOINTS = ["all-beers", "my-beers", "leaderboard", "beers", "delete-beer", "login"]
+BENCHMARK_EMAIL = "loadtest@example.com"
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain"], cwd=ROOT_DIR, capture_output=True, text=True).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except Exception:
+        return "unknown"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def sample_jpeg():
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new("RGB", (1200, 900), (200, 140, 40)).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content, content_type) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'.encode() + content + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class ApiTarget:
+    """Serves each api/<name>.py handler on its own local port"""
+
+    name = "api"
+
+    def __init__(self):
+        self.ports = {}
+        for endpoint in ENDPOINTS:
+            path = os.path.join(ROOT_DIR, "api", f"{endpoint}.py")
+            spec = importlib.util.spec_from_file_location(f"api_{endpoint.replace('-', '_')}", path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            quiet_handler = type("handler", (module.handler,), {
+                "log_message": lambda self, *args: None,
+                "disable_nagle_algorithm": True
+            })
+            server = fake_supabase.FakeSupabaseServer(("127.0.0.1", 0), quiet_handler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.ports[endpoint] = server.server_address[1]
+
+    def request(self, endpoint, context):
+        """Returns: (port, method, path, body, headers)"""
+        auth = {"Authorization": f"Bearer {context['token']}"}
+        page = "" if context["full_lists"] else f"?limit={context['page_size']}"
+        if endpoint == "all-beers":
+            return "GET", f"/api/all-beers{page}", None, {}
+        if endpoint == "my-beers":
+            return "GET", f"/api/my-beers{page}", None, auth
+        if endpoint == "leaderboard":
+            return "GET", "/api/leaderboard", None, {}
+        if endpoint == "beers":
+            body = json.dumps({"note": "Load test beer", "image_url": "https://example.com/beer.jpg"}).encode()
+            return "POST", "/api/beers", body, {**auth, "Content-Type": "application/json"}
+        if endpoint == "delete-beer":
+            return "DELETE", f"/api/delete-beer?beer_id={context['doomed'].get_nowait()}", None, auth
+        if endpoint == "login":
+            body = json.dumps({"email": BENCHMARK_EMAIL, "password": fake_supabase.DEFAULT_PASSWORD}).encode()
+            return "POST", "/api/login", body, {"Content-Type": "application/json"}
+        raise ValueError(endpoint)
+
+    def port(self, endpoint):
+        return self.ports[endpoint]
+
+
+class BackendTarget:
+    """Runs backend/main.py under uvicorn on a local port"""
+
+    name = "backend"
+
+    def __init__(self):
+        sys.path.insert(0, os.path.join(ROOT_DIR, "backend"))
+        import uvicorn
+        import main
+
+        self._port = free_port()
+        config = uvicorn.Config(main.app, host="127.0.0.1", port=self._port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        threading.Thread(target=self.server.run, daemon=True).start()
+        while not self.server.started:
+            time.sleep(0.05)
+        self.image = sample_jpeg()
+
+    def request(self, endpoint, context):
+        auth = {"Authorization": f"Bearer {context['token']}"}
+        page = "" if context["full_lists"] else f"?limit={context['page_size']}"
+        if endpoint == "all-beers":
+            return "GET", f"/api/beers/all{page}", None, {}
+        if endpoint == "my-beers":
+            return "GET", f"/api/beers/my{page}", None, auth
+        if endpoint == "leaderboard":
+            return "GET", "/api/leaderboard", None, {}
+        if endpoint == "beers":
+            body, content_type = multipart({"note": "Load test beer"}, {"image": ("beer.jpg", self.image, "image/jpeg")})
+            return "POST", "/api/beers", body, {**auth, "Content-Type": content_type}
+        if endpoint == "delete-beer":
+            return "DELETE", f"/api/beers/{context['doomed'].get_nowait()}", None, auth
+        if endpoint == "login":
+            body = json.dumps({"email": BENCHMARK_EMAIL, "password": fake_supabase.DEFAULT_PASSWORD}).encode()
+            return "POST", "/api/login", body, {"Content-Type": "application/json"}
+        raise ValueError(endpoint)
+
+    def port(self, endpoint):
+        return self._port
+
+
+def run_level(target, endpoint, total, concurrency, context):
+    """Fire total requests from concurrency threads; returns the result row"""
+    latencies = []
+    errors = []
+    counter = iter(range(total))
+    counter_lock = threading.Lock()
+    results_lock = threading.Lock()
+
+    def worker():
+        connection = http.client.HTTPConnection("127.0.0.1", target.port(endpoint), timeout=60)
+        while True:
+            with counter_lock:
+                if next(counter, None) is None:
+                    break
+            method, path, body, headers = target.request(endpoint, context)
+            started = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                elapsed = time.perf_counter() - started
+                if response.will_close:
+                    connection.close()
+                status = response.status
+            except Exception as e:
+                connection.close()
+                elapsed, status = time.perf_counter() - started, repr(e)
+            with results_lock:
+                latencies.append(elapsed)
+                if status not in (200, 201):
+                    errors.append(status)
+        connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    if errors:
+        print(f"  {endpoint}: {len(errors)} errors, e.g. {errors[0]}", file=sys.stderr)
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": len(errors),
+        "throughput_rps": round(total / wall, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def coalesced_reads():
+    """Reads the target has coalesced so far (both targets run in this process)"""
+    single_flight = sys.modules.get("single_flight")
+    return single_flight.stats()["coalesced"] if single_flight else 0
+
+
+def reseed(fake, beers, users):
+    # Cached responses describe the data being replaced
+    response_cache = sys.modules.get("response_cache")
+    if response_cache:
+        response_cache.response_cache.clear()
+    fake.db = fake_supabase.FakeDatabase()
+    fake.db.seed(beers, users)
+    user = fake.db.add_user(BENCHMARK_EMAIL, "Load Tester")
+    # The benchmark user gets a share of the data so my-beers has rows to page through
+    for _ in range(max(1, beers // users)):
+        fake.db.add_beer({"user_id": user["id"], "note": "Seeded beer", "image_url": "https://example.com/beer.jpg"})
+    return user
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(row["endpoint"], row["beers"], row["concurrency"]): row for row in baseline["results"]}
+
+    print(f"\nCompared with {baseline['meta']['commit']} ({baseline_path})")
+    print(f"{'endpoint':<12} {'beers':>7} {'conc':>5} {'rps':>10} {'was':>10} {'p95 ms':>9} {'was':>9}")
+    for row in results:
+        old = previous.get((row["endpoint"], row["beers"], row["concurrency"]))
+        if old:
+            print(
+                f"{row['endpoint']:<12} {row['beers']:>7} {row['concurrency']:>5} "
+                f"{row['throughput_rps']:>10.1f} {old['throughput_rps']:>10.1f} "
+                f"{row['p95_ms']:>9.1f} {old['p95_ms']:>9.1f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--target", choices=["api", "backend"], default="api")
+    parser.add_argument("--beers", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint per level")
+    parser.add_argument("--latency-ms", type=float, default=10, help="injected fake Supabase latency")
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=ENDPOINTS)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--full-lists", action="store_true", help="request whole lists instead of one page")
+    parser.add_argument("--output", help="JSON results path (default: benchmarks/results/<target>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    server, fake = fake_supabase.start(0, args.latency_ms / 1000, args.jitter_ms / 1000)
+    os.environ.update(fake_supabase.environment(server))
+    target = ApiTarget() if args.target == "api" else BackendTarget()
+
+    meta = {
+        "commit": git_commit(),
+        "target": target.name,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "page_size": None if args.full_lists else args.page_size,
+        "users": args.users,
+    }
+    print(f"Target {target.name} at {meta['commit']}, fake Supabase latency {args.latency_ms} ms")
+    print(
+        f"{'endpoint':<12} {'beers':>7} {'conc':>5} {'rps':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+        f"{'errors':>7} {'upstream':>9} {'coalesced':>10}"
+    )
+
+    results = []
+    for beers in args.beers:
+        user = reseed(fake, beers, args.users)
+        token = fake.issue_session(user)["access_token"]
+        for endpoint in args.endpoints:
+            for concurrency in args.concurrency:
+                doomed = queue.Queue()
+                if endpoint == "delete-beer":
+                    for _ in range(args.requests):
+                        doomed.put(fake.db.add_beer({"user_id": user["id"], "note": "To delete"})["id"])
+                context = {"token": token, "doomed": doomed, "page_size": args.page_size, "full_lists": args.full_lists}
+
+                upstream_before, coalesced_before = sum(fake.requests.values()), coalesced_reads()
+                row = {"beers": beers, **run_level(target, endpoint, args.requests, concurrency, context)}
+                row["upstream_requests"] = sum(fake.requests.values()) - upstream_before
+                row["coalesced"] = coalesced_reads() - coalesced_before
+                results.append(row)
+                print(
+                    f"{endpoint:<12} {beers:>7} {concurrency:>5} {row['throughput_rps']:>10.1f} "
+                    f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['errors']:>7} "
+                    f"{row['upstream_requests']:>9} {row['coalesced']:>10}"
+                )
+
+                if endpoint == "beers":
+                    # Keep the data size fixed for the endpoints that follow
+                    user = reseed(fake, beers, args.users)
+                    token = fake.issue_session(user)["access_token"]
+
+    output = args.output or os.path.join(BENCHMARKS_DIR, "results", f"{target.name}-{meta['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    print(f"\nSaved {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
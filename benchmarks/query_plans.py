@@ -0,0 +1,201 @@
+"""
+Check the query plans of the hot beers queries against a locally seeded Postgres
+
+Seeds a scratch schema, applies add-beer-indexes.sql and runs each query under
+EXPLAIN (ANALYZE, BUFFERS). Exits non-zero when a query reads beers with a Seq
+Scan, sorts instead of walking an index in order, or a deep keyset page touches
+far more buffers than the first page.
+
+Needs psql on the PATH and a database you can create schemas in
+(e.g. docker run -e POSTGRES_HOST_AUTH_METHOD=trust -p 5432:5432 postgres:15).
+
+Usage: python benchmarks/query_plans.py [--dsn postgresql://postgres@localhost/postgres] [--beers 200000] [--users 500]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+INDEXES_SQL = os.path.join(ROOT_DIR, "add-beer-indexes.sql")
+SCHEMA = "query_plan_check"
+PAGE_ROWS = 51  # pagination.DEFAULT_PAGE_SIZE plus the look-ahead row
+
+# Deep keyset pages may touch a few more buffers than the first page, not a scan's worth
+DEEP_PAGE_BUFFER_RATIO = 4
+
+SEED_SQL = """
+SET client_min_messages TO warning;
+DROP SCHEMA IF EXISTS {schema} CASCADE;
+CREATE SCHEMA {schema};
+SET search_path TO {schema};
+
+CREATE TABLE beers (
+  id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+  user_id UUID NOT NULL,
+  image_url TEXT NOT NULL,
+  image_variants JSONB,
+  note TEXT NOT NULL CHECK (length(note) <= 250),
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Skewed authors (a few heavy drinkers) over a year of timestamps
+WITH users AS (
+  SELECT array_agg(gen_random_uuid()) AS ids FROM generate_series(1, {users})
+)
+INSERT INTO beers (user_id, image_url, note, created_at)
+SELECT
+  users.ids[1 + floor(power(random(), 2) * {users})::int],
+  'https://example.com/beer-images/' || n || '.jpg',
+  'Seeded beer ' || n,
+  NOW() - random() * INTERVAL '365 days'
+FROM users, generate_series(1, {beers}) AS n;
+"""
+
+QUERIES = {
+    "all-beers first page": """
+        SELECT * FROM beers ORDER BY created_at DESC, id DESC LIMIT {page_rows}""",
+    "all-beers deep page": """
+        SELECT * FROM beers
+        WHERE created_at <= {feed_created_at}
+          AND (created_at < {feed_created_at} OR (created_at = {feed_created_at} AND id < {feed_id}))
+        ORDER BY created_at DESC, id DESC LIMIT {page_rows}""",
+    "my-beers first page": """
+        SELECT * FROM beers WHERE user_id = {user_id}
+        ORDER BY created_at DESC, id DESC LIMIT {page_rows}""",
+    "my-beers deep page": """
+        SELECT * FROM beers
+        WHERE user_id = {user_id} AND created_at <= {user_created_at}
+          AND (created_at < {user_created_at} OR (created_at = {user_created_at} AND id < {user_beer_id}))
+        ORDER BY created_at DESC, id DESC LIMIT {page_rows}""",
+    "delete ownership check": """
+        SELECT id, user_id FROM beers WHERE id = {user_beer_id} AND user_id = {user_id}""",
+    "feed version": """
+        SELECT MAX(created_at) FROM beers""",
+}
+
+# Deep page -> the first page it is compared with
+DEEP_PAGES = {
+    "all-beers deep page": "all-beers first page",
+    "my-beers deep page": "my-beers first page",
+}
+
+
+def psql(dsn, sql):
+    """Run sql in the scratch schema; returns psql's unaligned, tuples-only output"""
+    result = subprocess.run(
+        ["psql", dsn, "-X", "-q", "-A", "-t", "-v", "ON_ERROR_STOP=1",
+         "-c", f"SET search_path TO {SCHEMA}", "-c", sql],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"psql failed: {result.stderr.strip()}")
+    return result.stdout.strip()
+
+
+def literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def seed(dsn, beers, users):
+    subprocess.run(
+        ["psql", dsn, "-X", "-q", "-v", "ON_ERROR_STOP=1"],
+        input=SEED_SQL.format(schema=SCHEMA, beers=beers, users=users), text=True, check=True
+    )
+    with open(INDEXES_SQL) as indexes:
+        psql(dsn, indexes.read())
+
+
+def sample_parameters(dsn, beers):
+    """The heaviest user and cursors halfway down the feed and down that user's beers"""
+    user_id = psql(dsn, "SELECT user_id FROM beers GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1")
+    feed_created_at, feed_id = psql(
+        dsn, f"SELECT created_at, id FROM beers ORDER BY created_at DESC, id DESC OFFSET {beers // 2} LIMIT 1"
+    ).split("|")
+    user_created_at, user_beer_id = psql(
+        dsn,
+        f"SELECT created_at, id FROM beers WHERE user_id = {literal(user_id)} "
+        f"ORDER BY created_at DESC, id DESC OFFSET (SELECT COUNT(*) / 2 FROM beers WHERE user_id = {literal(user_id)}) LIMIT 1"
+    ).split("|")
+    return {
+        "page_rows": PAGE_ROWS,
+        "user_id": literal(user_id),
+        "feed_created_at": literal(feed_created_at),
+        "feed_id": literal(feed_id),
+        "user_created_at": literal(user_created_at),
+        "user_beer_id": literal(user_beer_id),
+    }
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def explain(dsn, sql):
+    """Returns: (execution_ms, shared buffers hit + read, plan nodes)"""
+    output = psql(dsn, f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")
+    plan = json.loads(output)[0]
+    root = plan["Plan"]
+    buffers = root.get("Shared Hit Blocks", 0) + root.get("Shared Read Blocks", 0)
+    return plan["Execution Time"], buffers, list(plan_nodes(root))
+
+
+def problems(nodes):
+    found = []
+    for node in nodes:
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") == "beers":
+            found.append("Seq Scan on beers")
+        if node["Node Type"] in ("Sort", "Incremental Sort"):
+            found.append(f"{node['Node Type']} on {', '.join(node.get('Sort Key', []))}")
+    return found
+
+
+def describe(nodes):
+    """Scan nodes with their index, e.g. 'Index Scan beers_created_at_id_idx'"""
+    scans = [
+        f"{node['Node Type']} {node.get('Index Name', node.get('Relation Name', ''))}".strip()
+        for node in nodes if "Scan" in node["Node Type"]
+    ]
+    return ", ".join(scans) or nodes[0]["Node Type"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL", "postgresql://postgres@localhost/postgres"))
+    parser.add_argument("--beers", type=int, default=200_000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--keep", action="store_true", help=f"leave the {SCHEMA} schema in place")
+    args = parser.parse_args()
+
+    print(f"Seeding {args.beers} beers from {args.users} users into {SCHEMA}...")
+    seed(args.dsn, args.beers, args.users)
+    parameters = sample_parameters(args.dsn, args.beers)
+
+    results = {}
+    failed = False
+    print(f"{'query':<24} {'ms':>8} {'buffers':>8}  plan")
+    for name, template in QUERIES.items():
+        execution_ms, buffers, nodes = explain(args.dsn, template.format(**parameters))
+        results[name] = buffers
+        issues = problems(nodes)
+        first_page = DEEP_PAGES.get(name)
+        if first_page and buffers > DEEP_PAGE_BUFFER_RATIO * max(results[first_page], 1):
+            issues.append(f"{buffers} buffers vs {results[first_page]} for the first page")
+        print(f"{name:<24} {execution_ms:>8.2f} {buffers:>8}  {describe(nodes)}")
+        for issue in issues:
+            print(f"{'':<24} FAIL: {issue}")
+        failed = failed or bool(issues)
+
+    if not args.keep:
+        psql(args.dsn, f"DROP SCHEMA {SCHEMA} CASCADE")
+
+    if failed:
+        sys.exit(1)
+    print("All hot queries use their indexes")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 import { useState, useEffect } from 'react'
 import { API_BASE } from '../config'
+import { pageQuery, feedImageUrl, ImageVariants } from '../services/api'
 
 interface Beer {
   id: string
   image_url: string
+  image_variants?: ImageVariants | null
   note: string
   created_at: string
   user_name: string
@@ -13,18 +15,25 @@ function AllBeers() {
   const [beers, setBeers] = useState<Beer[]>([])
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState<string | null>(null)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
+
+  const fetchPage = async (cursor: string | null) => {
+    const response = await fetch(`${API_BASE}/all-beers?${pageQuery(cursor)}`)
+
+    if (!response.ok) {
+      throw new Error('Failed to fetch beers')
+    }
+
+    const page = await response.json()
+    setBeers(previous => cursor ? [...previous, ...page.beers] : page.beers)
+    setNextCursor(page.next_cursor)
+  }
 
   useEffect(() => {
     const fetchAllBeers = async () => {
       try {
-        const response = await fetch(`${API_BASE}/all-beers`)
-
-        if (!response.ok) {
-          throw new Error('Failed to fetch beers')
-        }
-
-        const beersData = await response.json()
-        setBeers(beersData)
+        await fetchPage(null)
       } catch (error) {
         console.error('Error fetching beers:', error)
         setError('Failed to load beers')
@@ -36,6 +45,18 @@ function AllBeers() {
     fetchAllBeers()
   }, [])
 
+  const handleLoadMore = async () => {
+    setLoadingMore(true)
+    try {
+      await fetchPage(nextCursor)
+    } catch (error) {
+      console.error('Error fetching more beers:', error)
+      alert('Failed to load more beers. Please try again.')
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const formatDate = (dateString: string) => {
     return new Date(dateString).toLocaleDateString() + ' ' + new Date(dateString).toLocaleTimeString()
   }
@@ -79,7 +100,7 @@ function AllBeers() {
               {beers.map((beer) => (
                 <tr key={beer.id}>
                   <td>
-                    <img src={beer.image_url} alt="Beer" className="beer-image" />
+                    <img src={feedImageUrl(beer)} alt="Beer" className="beer-image" loading="lazy" />
                   </td>
                   <td>{beer.note}</td>
                   <td>{formatDate(beer.created_at)}</td>
@@ -88,6 +109,13 @@ function AllBeers() {
               ))}
             </tbody>
           </table>
+          {nextCursor && (
+            <div style={{ textAlign: 'center', padding: '1rem' }}>
+              <button onClick={handleLoadMore} disabled={loadingMore}>
+                {loadingMore ? 'Loading...' : 'Load more'}
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>
@@ -1,10 +1,11 @@
 import { useState, useEffect } from 'react'
 import { useAuth } from '../components/AuthContext'
-import { api } from '../services/api'
+import { api, feedImageUrl, ImageVariants } from '../services/api'
 
 interface Beer {
   id: string
   image_url: string
+  image_variants?: ImageVariants | null
   note: string
   created_at: string
 }
@@ -14,6 +15,8 @@ function MyBeers() {
   const [beers, setBeers] = useState<Beer[]>([])
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState<string | null>(null)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
 
   useEffect(() => {
     const fetchMyBeers = async () => {
@@ -23,8 +26,9 @@ function MyBeers() {
       }
 
       try {
-        const beersData = await api.getMyBeers()
-        setBeers(beersData)
+        const page = await api.getMyBeersPage()
+        setBeers(page.beers)
+        setNextCursor(page.next_cursor)
       } catch (error) {
         console.error('Error fetching beers:', error)
         setError('Failed to load your beers')
@@ -50,6 +54,20 @@ function MyBeers() {
     }
   }
 
+  const handleLoadMore = async () => {
+    setLoadingMore(true)
+    try {
+      const page = await api.getMyBeersPage(nextCursor)
+      setBeers(previous => [...previous, ...page.beers])
+      setNextCursor(page.next_cursor)
+    } catch (error) {
+      console.error('Error fetching more beers:', error)
+      alert('Failed to load more beers. Please try again.')
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const formatDate = (dateString: string) => {
     return new Date(dateString).toLocaleDateString() + ' ' + new Date(dateString).toLocaleTimeString()
   }
@@ -102,7 +120,8 @@ function MyBeers() {
                 <tr key={beer.id}>
                   <td>
                     <img 
-                      src={beer.image_url} 
+                      src={feedImageUrl(beer)} 
+                      loading="lazy"
                       alt="Beer" 
                       className="beer-image"
                       onError={(e) => {
@@ -131,6 +150,13 @@ function MyBeers() {
               ))}
             </tbody>
           </table>
+          {nextCursor && (
+            <div style={{ textAlign: 'center', padding: '1rem' }}>
+              <button onClick={handleLoadMore} disabled={loadingMore}>
+                {loadingMore ? 'Loading...' : 'Load more'}
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>
@@ -6,15 +6,38 @@ export interface User {
   name?: string
 }
 
+export type ImageVariants = Record<'thumb' | 'feed' | 'full', { webp: string; jpg: string }>
+
 export interface Beer {
   id: string
   user_id: string
   image_url: string
+  image_variants?: ImageVariants | null
   note: string
   created_at: string
   user_name?: string
 }
 
+// Prefer the resized feed variant, older posts only have the original image
+export function feedImageUrl(beer: Pick<Beer, 'image_url' | 'image_variants'>): string {
+  return beer.image_variants?.feed?.webp || beer.image_url
+}
+
+export interface BeerPage {
+  beers: Beer[]
+  next_cursor: string | null
+}
+
+export const PAGE_SIZE = 50
+
+export function pageQuery(cursor?: string | null, limit: number = PAGE_SIZE): string {
+  const params = new URLSearchParams({ limit: String(limit) })
+  if (cursor) {
+    params.set('cursor', cursor)
+  }
+  return params.toString()
+}
+
 class ApiService {
   private token: string | null = null
   private refreshToken: string | null = null
@@ -217,10 +240,18 @@ class ApiService {
     return this.request('/my-beers')
   }
 
+  async getMyBeersPage(cursor?: string | null): Promise<BeerPage> {
+    return this.request(`/my-beers?${pageQuery(cursor)}`)
+  }
+
   async getAllBeers(): Promise<Beer[]> {
     return this.request('/all-beers')
   }
 
+  async getAllBeersPage(cursor?: string | null): Promise<BeerPage> {
+    return this.request(`/all-beers?${pageQuery(cursor)}`)
+  }
+
   async deleteBeer(beerId: string) {
     return this.request(`/delete-beer?beer_id=${encodeURIComponent(beerId)}`, {
       method: 'DELETE'